@@ -0,0 +1,51 @@
+import os
+import sys
+import argparse
+import subprocess
+
+ROOT = os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) )
+
+#What `python -m manager` imports before it does any work.
+ENTRY_MODULE = 'manager.__main__'
+
+#Modules a headless build must never import just to start up.
+FORBIDDEN = ( 'kivy', 'difflib', 'xml.etree.ElementTree', 'logging.handlers', 'multiprocessing.util', 'manager.diff', 'manager.xml_combiner' )
+
+def import_times( module ):
+    ''' Imports module in a fresh interpreter under -X importtime; returns { module: ( self us, cumulative us ) }. '''
+    output = subprocess.run( [ sys.executable, '-X', 'importtime', '-c', 'import ' + module ], cwd = ROOT,
+                             stdout = subprocess.DEVNULL, stderr = subprocess.PIPE, universal_newlines = True, check = True ).stderr
+
+    times = {}
+    for line in output.splitlines():
+        if not line.startswith( 'import time:' ) or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[ len( 'import time:' ): ].split( '|' )
+        times[ name.strip() ] = ( int( self_us ), int( cumulative_us ) )
+    return times
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser( description = 'Checks how long the headless build takes to import against a budget.' )
+    parser.add_argument( '--budget-ms', type = float, default = 150, help = 'most the entry point may take to import' )
+    parser.add_argument( '--repeat', type = int, default = 5, help = 'imports to time; the fastest counts' )
+    parser.add_argument( '--top', type = int, default = 10, help = 'slowest imports to list' )
+    args = parser.parse_args()
+
+    runs = [ import_times( ENTRY_MODULE ) for _ in range( args.repeat ) ]
+    fastest = min( runs, key = lambda times: times[ ENTRY_MODULE ][ 1 ] )
+    total_ms = fastest[ ENTRY_MODULE ][ 1 ] / 1000
+
+    print( 'import {0}: {1:.1f} ms (budget {2:.1f} ms)'.format( ENTRY_MODULE, total_ms, args.budget_ms ) )
+    for name, ( self_us, cumulative_us ) in sorted( fastest.items(), key = lambda item: item[1][0], reverse = True )[ :args.top ]:
+        print( '    {0:<40} self {1:>7.1f} ms  cumulative {2:>7.1f} ms'.format( name, self_us / 1000, cumulative_us / 1000 ) )
+
+    failed = False
+    forbidden = [ name for name in FORBIDDEN if any( module == name or module.startswith( name + '.' ) for module in fastest ) ]
+    if forbidden:
+        print( 'FAIL: {0} imports {1}'.format( ENTRY_MODULE, ', '.join( forbidden ) ) )
+        failed = True
+    if total_ms > args.budget_ms:
+        print( 'FAIL: over budget by {0:.1f} ms'.format( total_ms - args.budget_ms ) )
+        failed = True
+
+    sys.exit( 1 if failed else 0 )
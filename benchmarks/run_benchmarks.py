@@ -0,0 +1,205 @@
+import os
+import sys
+import argparse
+import json
+import time
+import random
+import datetime
+import platform
+import statistics
+import subprocess
+import tempfile
+import shutil
+import contextlib
+import multiprocessing
+
+try:
+    import resource
+except ImportError:
+    #Windows has no resource module; peak RSS is recorded as None there.
+    resource = None
+
+sys.path.insert( 0, os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) ) )
+
+import manager
+from benchmarks import workload as workloads
+
+def peak_rss_kb():
+    ''' Peak resident set size of this process and its finished children in KiB. '''
+    if resource is None:
+        return None
+    peak = resource.getrusage( resource.RUSAGE_SELF ).ru_maxrss + resource.getrusage( resource.RUSAGE_CHILDREN ).ru_maxrss
+    #macOS reports bytes, everyone else KiB.
+    if sys.platform == 'darwin':
+        peak //= 1024
+    return peak
+
+def bench_populate_paks( workload, jobs ):
+    workload.clean_build()
+    mngr = manager.Manager( *workload.manager_args(), jobs = jobs )
+
+    started = time.perf_counter()
+    mngr.populate_paks()
+    return time.perf_counter() - started
+
+def bench_make_omnipak( workload, jobs ):
+    workload.clean_build()
+    mngr = manager.Manager( *workload.manager_args(), jobs = jobs )
+    mngr.populate_paks()
+
+    started = time.perf_counter()
+    mngr.make_omnipak()
+    return time.perf_counter() - started
+
+def bench_make_omnipak_incremental( workload, jobs ):
+    workload.clean_build()
+    mngr = manager.Manager( *workload.manager_args(), jobs = jobs )
+    mngr.populate_paks()
+    mngr.make_omnipak()
+
+    mngr = manager.Manager( *workload.manager_args(), jobs = jobs )
+    started = time.perf_counter()
+    mngr.populate_paks()
+    mngr.make_omnipak()
+    return time.perf_counter() - started
+
+def bench_diff_combine( workload, jobs ):
+    ''' Merges two edited copies of the largest vanilla script through DiffCombiner, timing the second combine. '''
+    with manager.PakFile( workload.data_path + 'Scripts.pak' ) as pak:
+        info = max( pak.infolist(), key = lambda info: info.file_size )
+        vanilla = pak.read( info ).decode('latin-1').split( '\n' )
+
+    rng = random.Random( 0 )
+    original_file = manager.File( info.filename, '\n'.join( vanilla ) )
+    mod_files = [ manager.File( info.filename, '\n'.join( workloads.edit_lines( rng, vanilla, 0.02, mod ) ) ) for mod in range( 2 ) ]
+
+    def combine( mod_file, omni_mod_file ):
+        return manager.DiffCombiner( None, original_file, mod_file, omni_mod_file, 'mod.pak', workload.log_folder_path, 10, 5 ).combine()
+
+    omni_mod_file = manager.File( info.filename, combine( mod_files[ 0 ], manager.File( info.filename, None ) ) )
+
+    started = time.perf_counter()
+    combine( mod_files[ 1 ], omni_mod_file )
+    return time.perf_counter() - started
+
+def bench_pak_write( workload, jobs ):
+    pak_path = os.path.join( workload.root, 'pak_write.pak' )
+    files = []
+    for source in ( 'Tables.pak', 'Scripts.pak', 'Textures' + os.sep + 'Textures.pak' ):
+        files += manager.Pak( workload.data_path + source, raw_types = [ 'dds' ] ).files
+
+    pak = manager.Pak( pak_path )
+    pak.files = files
+
+    started = time.perf_counter()
+    pak.write()
+    elapsed = time.perf_counter() - started
+
+    os.remove( pak_path )
+    return elapsed
+
+BENCHMARKS = [
+    ( 'populate_paks', bench_populate_paks ),
+    ( 'make_omnipak', bench_make_omnipak ),
+    ( 'make_omnipak_incremental', bench_make_omnipak_incremental ),
+    ( 'diff_combine', bench_diff_combine ),
+    ( 'pak_write', bench_pak_write ),
+]
+
+def _run_case( benchmark, workload_root, jobs, repeat, results ):
+    ''' Runs in a fresh process so every case's peak RSS is its own. '''
+    function = dict( BENCHMARKS )[ benchmark ]
+    workload = workloads.Workload( workload_root )
+
+    with open( os.devnull, 'w' ) as devnull, contextlib.redirect_stdout( devnull ):
+        times = [ function( workload, jobs ) for _ in range( repeat ) ]
+        #Let the log listener drain while stdout is still redirected.
+        manager.stop_plog()
+
+    results.put( { 'times' : times, 'peak_rss_kb' : peak_rss_kb() } )
+
+def run_case( benchmark, workload_root, jobs, repeat ):
+    context = multiprocessing.get_context( 'spawn' )
+    results = context.Queue()
+    process = context.Process( target = _run_case, args = ( benchmark, workload_root, jobs, repeat, results ) )
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+def git_commit():
+    try:
+        return subprocess.check_output( [ 'git', 'rev-parse', '--short', 'HEAD' ], cwd = os.path.dirname( os.path.abspath( __file__ ) ), stderr = subprocess.DEVNULL ).decode().strip()
+    except ( OSError, subprocess.CalledProcessError ):
+        return None
+
+def compare( results, baseline_path ):
+    with open( baseline_path, 'r' ) as baseline:
+        baseline = { ( result[ 'benchmark' ], result[ 'size' ] ) : result for result in json.load( baseline )[ 'results' ] }
+
+    print( '' )
+    print( 'Compared to {0}:'.format( baseline_path ) )
+    for result in results:
+        before = baseline.get( ( result[ 'benchmark' ], result[ 'size' ] ) )
+        if before is None:
+            continue
+        print( '    {0:<26} {1:<7} wall {2:>8.3f}s -> {3:>8.3f}s ({4:+.1%})'.format( result[ 'benchmark' ], result[ 'size' ],
+                                                                                   before[ 'wall_time' ], result[ 'wall_time' ],
+                                                                                   result[ 'wall_time' ] / before[ 'wall_time' ] - 1 if before[ 'wall_time' ] else 0 ) )
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser( description = 'Times Manager phases against synthetic workloads and records wall time and peak RSS as JSON.' )
+    parser.add_argument( '--sizes', default = 'small,medium', help = 'comma separated sizes to sweep ({0})'.format( ', '.join( workloads.SIZES ) ) )
+    parser.add_argument( '--benchmarks', default = ','.join( name for name, _ in BENCHMARKS ), help = 'comma separated benchmarks to run' )
+    parser.add_argument( '--repeat', type = int, default = 3, help = 'runs per benchmark; wall_time is the median' )
+    parser.add_argument( '--jobs', type = int, default = 1, help = 'passed on to Manager' )
+    parser.add_argument( '--overlap', type = float, default = 0.25 )
+    parser.add_argument( '--edit-density', type = float, default = 0.01 )
+    parser.add_argument( '--workdir', help = 'where workloads are generated (default: a temporary folder)' )
+    parser.add_argument( '--output', help = 'JSON file to write (default: benchmarks/results/<commit>.json)' )
+    parser.add_argument( '--compare', help = 'earlier results JSON to compare wall times against' )
+    args = parser.parse_args()
+
+    commit = git_commit()
+    output = args.output or os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), 'results', '{0}.json'.format( commit or 'unknown' ) )
+    workdir = args.workdir or tempfile.mkdtemp( prefix = 'sml_bench_' )
+
+    results = []
+    try:
+        for size in args.sizes.split( ',' ):
+            params = dict( workloads.SIZES[ size ], overlap = args.overlap, edit_density = args.edit_density )
+            print( 'Generating {0} workload.'.format( size ) )
+            workload = workloads.generate_size( os.path.join( workdir, size ), size, overlap = args.overlap, edit_density = args.edit_density )
+
+            for benchmark in args.benchmarks.split( ',' ):
+                result = run_case( benchmark, workload.root, args.jobs, args.repeat )
+                results.append( {
+                    'benchmark' : benchmark,
+                    'size' : size,
+                    'params' : params,
+                    'jobs' : args.jobs,
+                    'wall_time' : statistics.median( result[ 'times' ] ),
+                    'times' : result[ 'times' ],
+                    'peak_rss_kb' : result[ 'peak_rss_kb' ],
+                } )
+                print( '    {0:<26} {1:<7} {2:>8.3f}s  peak rss {3} KiB'.format( benchmark, size, results[-1][ 'wall_time' ], results[-1][ 'peak_rss_kb' ] ) )
+    finally:
+        if not args.workdir:
+            shutil.rmtree( workdir, ignore_errors = True )
+
+    if not os.path.isdir( os.path.dirname( os.path.abspath( output ) ) ):
+        os.makedirs( os.path.dirname( os.path.abspath( output ) ) )
+
+    with open( output, 'w' ) as file:
+        json.dump( {
+            'commit' : commit,
+            'created' : datetime.datetime.now().isoformat(),
+            'python' : platform.python_version(),
+            'platform' : platform.platform(),
+            'cpu_count' : os.cpu_count(),
+            'results' : results,
+        }, file, indent = 2 )
+    print( 'Wrote {0}'.format( output ) )
+
+    if args.compare:
+        compare( results, args.compare )
@@ -0,0 +1,153 @@
+import zipfile
+import os
+import argparse
+import random
+import shutil
+
+#Presets for the size sweeps; tables x rows is the bulk of what gets diffed and merged.
+SIZES = {
+    'small'  : dict( tables = 8,   rows = 200,  scripts = 4,  script_lines = 300,  textures = 8,   mods = 4 ),
+    'medium' : dict( tables = 40,  rows = 800,  scripts = 16, script_lines = 1500, textures = 64,  mods = 12 ),
+    'large'  : dict( tables = 120, rows = 3000, scripts = 48, script_lines = 6000, textures = 256, mods = 32 ),
+}
+
+class Workload( object ):
+    ''' Paths of a generated game/mods tree laid out the way Manager expects them. '''
+    def __init__(self, root):
+        self.root = root
+        self.data_path = os.path.join( root, 'Data' ) + os.sep
+        self.mods_path = os.path.join( root, 'mods' ) + os.sep
+        self.diff_report_folder_path = os.path.join( root, 'diff_reports' ) + os.sep
+        self.log_folder_path = os.path.join( root, 'logs' ) + os.sep
+        self.cache_folder_path = os.path.join( root, 'cache' ) + os.sep
+        self.load_order_path = os.path.join( root, 'load_order.txt' )
+
+    def manager_args(self):
+        return ( self.data_path, self.mods_path, self.diff_report_folder_path, self.log_folder_path, self.load_order_path, self.cache_folder_path )
+
+    def clean_build(self):
+        ''' Removes everything a previous build left behind so the next one starts cold. '''
+        for path in ( self.diff_report_folder_path, self.log_folder_path, self.cache_folder_path ):
+            shutil.rmtree( path, ignore_errors = True )
+            os.makedirs( path )
+        for filename in os.listdir( self.data_path ):
+            if filename.startswith( 'zzz_simple_mod_loader' ):
+                os.remove( self.data_path + filename )
+
+def table_lines( rng, table, rows, bom = False ):
+    lines = [ ( '\ufeff' if bom else '' ) + '<?xml version="1.0" encoding="us-ascii"?>',
+              '<database xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" name="barbora">',
+              '\t<table name="t{0}">'.format( table ),
+              '\t\t<rows>' ]
+    for row in range( rows ):
+        lines.append( '\t\t\t<row item_id="{0}" item_name="item_{1}_{0}" price="{2}" weight="{3}" />'.format( row, table, rng.randint( 1, 999 ), rng.randint( 1, 50 ) ) )
+    lines += [ '\t\t</rows>', '\t</table>', '</database>' ]
+    return lines
+
+def script_lines( rng, script, count ):
+    lines = [ '-- script_{0}.lua'.format( script ), '' ]
+    function = 0
+    while len( lines ) < count:
+        lines.append( 'function Script{0}:Fn{1}( entity )'.format( script, function ) )
+        for _ in range( rng.randint( 3, 12 ) ):
+            lines.append( '\tentity.value_{0} = {1}'.format( rng.randint( 0, 99 ), rng.randint( 0, 9999 ) ) )
+        lines += [ 'end', '' ]
+        function += 1
+    return lines
+
+def edit_lines( rng, lines, edit_density, mod_index ):
+    ''' Changes, inserts and deletes about edit_density of the body lines the way a hand made mod would. '''
+    lines = list( lines )
+    edits = max( 1, int( len( lines ) * edit_density ) )
+    for _ in range( edits ):
+        #Keep away from the headers and footers so xml files stay well formed.
+        i = rng.randint( 4, max( 4, len( lines ) - 5 ) )
+        line = lines[ i ]
+        roll = rng.random()
+        if roll < 0.6:
+            if 'price="' in line:
+                lines[ i ] = line.replace( 'price="', 'price="{0}'.format( mod_index + 1 ), 1 )
+            else:
+                lines[ i ] = line + ' -- mod{0}'.format( mod_index )
+        elif roll < 0.85:
+            if '<row ' in line:
+                lines.insert( i, line.replace( 'item_id="', 'item_id="9{0}'.format( mod_index ), 1 ) )
+            else:
+                lines.insert( i, '\tentity.mod{0} = {1}'.format( mod_index, rng.randint( 0, 9999 ) ) )
+        elif '<row ' in line or line.startswith( '\tentity.' ):
+            del lines[ i ]
+    return lines
+
+def generate( root, tables = 8, rows = 200, scripts = 4, script_lines_count = 300, textures = 8, mods = 4, overlap = 0.25, edit_density = 0.01, seed = 0, compression = zipfile.ZIP_DEFLATED ):
+    ''' Builds a fake KCD install under root and returns its Workload.
+
+        Data/Tables.pak holds tables xml tables of rows rows, every other one starting with a byte order mark,
+        Data/Scripts.pak line merged lua scripts and Data/Textures/Textures.pak binary dds files. Every one of
+        the mods mods edits about overlap of the vanilla text files, changing about edit_density of their lines,
+        and ships one texture and one new file.
+    '''
+    rng = random.Random( seed )
+    workload = Workload( root )
+
+    shutil.rmtree( root, ignore_errors = True )
+    os.makedirs( workload.data_path + 'Textures' )
+    os.makedirs( workload.mods_path )
+    workload.clean_build()
+
+    vanilla = {}
+    with zipfile.ZipFile( workload.data_path + 'Tables.pak', 'w', compression ) as pak:
+        for table in range( tables ):
+            filepath = 'Libs/Tables/rpg/table_{0}.xml'.format( table )
+            #Some tables in the game are saved with a UTF-8 byte order mark.
+            vanilla[ filepath ] = table_lines( rng, table, rows, bom = table % 2 == 1 )
+            pak.writestr( filepath, '\n'.join( vanilla[ filepath ] ) )
+
+    with zipfile.ZipFile( workload.data_path + 'Scripts.pak', 'w', compression ) as pak:
+        for script in range( scripts ):
+            filepath = 'Scripts/Entities/script_{0}.lua'.format( script )
+            vanilla[ filepath ] = script_lines( rng, script, script_lines_count )
+            pak.writestr( filepath, '\n'.join( vanilla[ filepath ] ) )
+
+    with zipfile.ZipFile( workload.data_path + 'Textures' + os.sep + 'Textures.pak', 'w', zipfile.ZIP_STORED ) as pak:
+        for texture in range( textures ):
+            pak.writestr( 'Textures/texture_{0}.dds'.format( texture ), b'DDS ' + rng.getrandbits( 8 * 4096 ).to_bytes( 4096, 'little' ) )
+
+    vanilla_paths = sorted( vanilla )
+    mod_names = []
+    for mod in range( mods ):
+        mod_name = 'mod_{0:03d}.pak'.format( mod )
+        mod_names.append( mod_name )
+        with zipfile.ZipFile( workload.mods_path + mod_name, 'w', compression ) as pak:
+            for filepath in rng.sample( vanilla_paths, max( 1, int( len( vanilla_paths ) * overlap ) ) ):
+                pak.writestr( filepath, '\n'.join( edit_lines( rng, vanilla[ filepath ], edit_density, mod ) ) )
+            if textures:
+                pak.writestr( 'Textures/texture_{0}.dds'.format( rng.randrange( textures ) ), b'DDS ' + bytes( [ mod % 256 ] ) * 4096 )
+            pak.writestr( 'Libs/Tables/rpg/mod_{0}.tbl'.format( mod ), b'\x00\xfftbl' * 64 )
+
+    with open( workload.load_order_path, 'w' ) as load_order:
+        load_order.write( '\n'.join( mod_names ) )
+
+    return workload
+
+def generate_size( root, size, **overrides ):
+    params = dict( SIZES[ size ] )
+    params.update( overrides )
+    params[ 'script_lines_count' ] = params.pop( 'script_lines' )
+    return generate( root, **params )
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser( description = 'Generates a synthetic game Data folder and mods folder to benchmark against.' )
+    parser.add_argument( 'root', help = 'folder to generate the workload in (it is wiped first)' )
+    parser.add_argument( '--size', choices = sorted( SIZES ), default = 'small' )
+    parser.add_argument( '--mods', type = int, help = 'number of mods (overrides --size)' )
+    parser.add_argument( '--overlap', type = float, default = 0.25, help = 'fraction of vanilla text files each mod edits' )
+    parser.add_argument( '--edit-density', type = float, default = 0.01, help = 'fraction of lines each edited file changes' )
+    parser.add_argument( '--seed', type = int, default = 0 )
+    args = parser.parse_args()
+
+    overrides = dict( overlap = args.overlap, edit_density = args.edit_density, seed = args.seed )
+    if args.mods is not None:
+        overrides[ 'mods' ] = args.mods
+
+    workload = generate_size( args.root, args.size, **overrides )
+    print( 'Generated {0} workload in {1}'.format( args.size, workload.root ) )
@@ -0,0 +1,34 @@
+''' Simple Mod Loader's omni-mod builder.
+
+    Names are imported from their submodule the first time they are used, so `import manager` costs next to
+    nothing and `python -m manager` only imports what a build needs. Nothing in here imports kivy.
+'''
+import importlib
+
+_EXPORTS = {
+    'log'          : ( 'init_plog', 'plog_file', 'attach_plog_file', 'dprint', 'plog', 'stop_plog' ),
+    'trace'        : ( 'Tracer', 'TRACER' ),
+    'diff'         : ( 'pop_str', 'insert_str', 'DiffHunk', 'sequence_matcher_diff', 'patience_diff', 'DIFF_ENGINES',
+                       'LineTable', 'LineIndex', 'iter_lines', 'DiffCombiner' ),
+    'xml_combiner' : ( 'reindentXmlString', 'AmbiguousXmlError', 'XmlCombiner' ),
+    'pak'          : ( 'PakFile', 'FileContentsElement', 'FileContents', 'File', 'LazyFile', 'RawFile', 'Pak', 'PakWriter' ),
+    'index'        : ( 'PakIndexEntry', 'PakIndex', 'ModManifestEntry', 'ModManifestCache', 'VanillaCache' ),
+    'omni_mod'     : ( 'OmniManifest', 'MergeTarget', 'MergePlan', 'DIFF_REPORT_MODES', 'DiffReport', 'DiffReportWriter', 'OmniModFileBuilder' ),
+    'core'         : ( 'Manager', 'read_exe_path', 'get_paths' ),
+}
+
+_MODULES = { name: module for module, names in _EXPORTS.items() for name in names }
+
+__all__ = sorted( _MODULES )
+
+def __getattr__( name ):
+    module = _MODULES.get( name )
+    if module is None:
+        raise AttributeError( 'module {0!r} has no attribute {1!r}'.format( __name__, name ) )
+
+    value = getattr( importlib.import_module( __name__ + '.' + module ), name )
+    globals()[ name ] = value
+    return value
+
+def __dir__():
+    return sorted( set( globals() ) | set( _MODULES ) )
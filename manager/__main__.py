@@ -0,0 +1,83 @@
+import os
+import sys
+import argparse
+import time
+import threading
+import logging
+import datetime
+
+from manager.log import plog, stop_plog
+from manager.trace import TRACER
+from manager.omni_mod import DIFF_REPORT_MODES
+from manager.core import Manager, get_paths
+
+def play_loading_anim( started ):
+    global PLAYANIM
+    
+    anim = [ '\\', '|', '/', '-'  ]
+    PLAYANIM = True
+    while PLAYANIM:
+        for x in range( len(anim) ):
+            print ( 'Loading{0} Elapsed Time - {1} - Please allow up to 5 minutes for each mod.\r'.format( anim[ x ], datetime.datetime.now()-started, ), end='' )
+            time.sleep(0.3)
+    print(' '*100)
+
+def log_exception( *exc_info ):
+    import traceback
+    plog( 'Exception raised:\n%s', ''.join(traceback.format_exception(*exc_info) ), level=logging.ERROR )
+
+def main():
+    global PLAYANIM
+
+    started = datetime.datetime.now()
+
+    parser = argparse.ArgumentParser( prog = 'python -m manager', description = 'Builds the Simple Mod Loader omni-mod.' )
+    parser.add_argument( '--jobs', type = int, default = 1, help = 'number of processes to merge with (0 = one per cpu)' )
+    parser.add_argument( '--dry-run', action = 'store_true', help = 'print what the omni-mod build would do without building it' )
+    parser.add_argument( '--diff-reports', choices = DIFF_REPORT_MODES, default = 'summary', help = 'what to record in diff_reports/diff_reports.zip about every merge' )
+    parser.add_argument( '--max-merge-memory', type = int, metavar = 'MB', help = 'merge files bigger than this in windows; bounds memory but can place lines differently' )
+    parser.add_argument( '--trace', metavar = 'OUT_JSON', help = 'record where build time goes as a Chrome trace_event file' )
+    args = parser.parse_args()
+
+    if args.trace:
+        TRACER.enable()
+    
+    #TODO: Make a server and ask the user if it's ok to send us data with 'add data is anonymous blah blah blah', if yes; on exception; send logfiles to server.
+    sys.excepthook = log_exception
+
+    usercfg, data_path, localization_path, mods_path, diff_report_folder_path, log_folder_path, load_order_path, cache_folder_path = get_paths()
+
+    loading_anim_thread = threading.Thread( target=play_loading_anim, args = ( started, )  )
+    
+    if not os.path.isfile( os.path.dirname( os.path.abspath('__file__') ) + os.sep + '.gitignore' ):
+        loading_anim_thread.start()
+
+    manager = Manager( data_path, mods_path, diff_report_folder_path, log_folder_path, load_order_path, cache_folder_path, jobs = args.jobs, diff_reports = args.diff_reports )
+    if args.max_merge_memory:
+        manager.max_merge_memory = args.max_merge_memory * 1024 * 1024
+    manager.populate_paks()
+    if args.dry_run:
+        plan = manager.plan_omnipak()
+        plog( plan.report() )
+        plan.close()
+    else:
+        manager.make_omnipak()
+
+    PLAYANIM = False
+
+    if args.trace:
+        TRACER.save( args.trace )
+        plog( 'Wrote trace to %s', args.trace )
+
+    try:
+        loading_anim_thread.join()
+    except RuntimeError:
+        pass
+
+    plog( 'Elapsed Time - %s', datetime.datetime.now() - started )
+    plog( 'Successfully Loaded All Mods' )
+    stop_plog()
+    input( 'Press Enter/Return to close...' )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,457 @@
+import zipfile
+import os
+import collections
+import concurrent.futures
+import logging
+
+from manager.log import init_plog, plog, plog_file
+from manager.trace import TRACER
+from manager.pak import File, RawFile, Pak, PakWriter
+from manager.index import PakIndex, ModManifestCache, VanillaCache
+from manager.omni_mod import OmniManifest, MergeTarget, MergePlan, DiffReportWriter, OmniModFileBuilder, _init_merge_worker, _merge_worker_build
+
+class Manager( object ):
+    def __init__(self, game_files_filepath, mod_files_filepath, diff_report_folder, log_folder_path, load_order_path, cache_folder_path = None, jobs = 1, diff_reports = 'summary'):
+        self.mod_files_filepath = mod_files_filepath
+        if self.mod_files_filepath[-1] != os.sep:
+            self.mod_files_filepath += os.sep
+
+        if not os.path.exists(self.mod_files_filepath):
+            os.makedirs(self.mod_files_filepath)
+
+        self.game_files_filepath = game_files_filepath
+        if self.game_files_filepath[-1] != os.sep:
+            self.game_files_filepath += os.sep
+            
+        self.diff_report_folder = diff_report_folder
+        if self.diff_report_folder[-1] != os.sep:
+            self.diff_report_folder += os.sep
+            
+        self.log_folder_path = log_folder_path
+        if self.log_folder_path[-1] != os.sep:
+            self.log_folder_path += os.sep
+            
+        self.load_order_path = load_order_path
+
+        #One of DIFF_REPORT_MODES; reports end up in diff_report_archive_path.
+        self.diff_report_mode = diff_reports
+        self.diff_report_archive_path = self.diff_report_folder + 'diff_reports.zip'
+
+        #Number of worker processes make_omnipak merges with; 0 means one per cpu.
+        self.jobs = jobs or os.cpu_count() or 1
+
+        self.cache_folder_path = cache_folder_path or os.path.dirname( os.path.abspath('__file__') ) + os.sep + 'cache' + os.sep
+        if self.cache_folder_path[-1] != os.sep:
+            self.cache_folder_path += os.sep
+
+        self.omni_mod_name = 'zzz_simple_mod_loader.pak'
+        self.omni_mod_path = self.game_files_filepath + self.omni_mod_name
+        self.omni_manifest_path = self.omni_mod_path[:-4] + '.manifest.json'
+        
+        self.pak_index = PakIndex( self.cache_folder_path + 'pak_index.json' )
+        self.mod_manifests = ModManifestCache( self.cache_folder_path + 'mod_manifests.json' )
+        
+        self.non_mergeable_types = [ 'tbl', 'dds' ]
+
+        #TODO: Move accuracy and area out to a config file;
+        self.merge_accuracy = 10
+        self.merge_area_size = 5
+
+        #One of DIFF_ENGINES.
+        self.diff_engine = 'patience'
+
+        #Lowercased folders whose .xml files are merged element by element by XmlCombiner.
+        self.xml_merge_paths = [ 'libs/tables/', 'libs/ui/' ]
+
+        #Bytes one line merge may use before it is done in windows, which can place lines differently; None is unlimited.
+        self.max_merge_memory = None
+
+        #Bytes of vanilla files extracted ahead of the merges that need them.
+        self.vanilla_prefetch_size = 64 * 1024 * 1024
+
+        #zipfile.ZIP_STORED or zipfile.ZIP_DEFLATED; members copied raw keep the compression they came with.
+        self.omni_mod_compression = zipfile.ZIP_STORED
+
+        self.mod_pak_paths = []
+        #os.stat_result of every mod pak, straight from the one scandir of the mods folder.
+        self.mod_pak_stats = {}
+
+    def populate_paks(self, sort = True):
+        with TRACER.span( 'populate_paks' ):
+            self._populate_mod_pak_paths()
+            self._populate_original_game_pak_paths()
+            if sort:
+                self._sort_mods_by_load_order()
+
+    def populate_mod_paks(self, sort = True):
+        ''' Finds the mod paks, in load order, without walking the game files; all the mod list needs. '''
+        self._populate_mod_pak_paths()
+        if sort:
+            self._sort_mods_by_load_order()
+
+    def scan_mod_paks(self, progress = None):
+        ''' Brings the cached manifest of every mod pak populate_mod_paks found up to date.
+            progress, if given, is called as progress( done, total ) from the calling thread.
+        '''
+        self.mod_manifests.update( self.mod_pak_paths, self.non_mergeable_types, self.mod_pak_stats, progress )
+
+    def _file_to_pak(self, filepath, lazy = False):
+        pak = None
+
+        if( filepath[-4:] == '.pak' ):
+            pak = Pak( filepath, lazy = lazy, raw_types = self.non_mergeable_types )
+        elif( filepath[-4:] == '.zip' ):
+            #TODO: if user.cfg is in the zip file; append contents to user.cfg
+            #TODO: if bin in zip file; go looking for user.cfg in bin/Win64
+            #TODO: if Localization is in .zip file; do localization stuff...
+            #TODO: if Data is in .zip file; recursively call '_populate_mod_paks' on the new "Data" folder.
+            #TODO: if Engine is in .zip file; recursively call '_populate_mod_paks' on Engine folder.
+            #TODO: if .pak is in .zip file; load in the .pak file.
+            pass
+
+        return pak
+            
+    def _populate_mod_pak_paths(self):
+        plog('Getting mod paks.')
+        #Populating again, as the mod list does on reload, starts from scratch.
+        self.mod_pak_paths = []
+        self.mod_pak_stats = {}
+        plog( 'included mods:', level=logging.DEBUG )
+        with TRACER.span( 'discover_mod_paks' ), os.scandir( self.mod_files_filepath ) as entries:
+            for entry in entries:
+                plog( '    %s', entry.name, level=logging.DEBUG )
+                if ( entry.name[-4:] == '.pak' or entry.name[-4:] == '.zip' ) and entry.is_file():
+                    self.mod_pak_paths.append( self.mod_files_filepath + entry.name )
+                    self.mod_pak_stats[ self.mod_files_filepath + entry.name ] = entry.stat()
+                
+    def _populate_original_game_pak_paths(self):
+        plog('Getting necessary game files.')
+        def get_all_game_pak_paths():
+            ''' Returns every .pak under the game files and its stat, walking the tree with os.scandir
+                so directory checks come from the DirEntry instead of another syscall per entry.
+            '''
+            paks = {}
+            folders = [ self.game_files_filepath ]
+            while folders:
+                fp = folders.pop()
+                if fp[-1] != os.sep:
+                    fp += os.sep
+
+                with os.scandir( fp ) as entries:
+                    for entry in entries:
+                        if entry.is_dir():
+                            folders.append( fp + entry.name )
+                        elif '.pak' in entry.name and entry.name[0].lower() != 'z':
+                            paks[ fp + entry.name ] = entry.stat()
+
+            return paks
+
+        with TRACER.span( 'discover_game_paks' ):
+            pak_stats = get_all_game_pak_paths()
+            pak_stats.pop( self.omni_mod_path, None )
+            pak_paths = sorted( pak_stats )
+
+        plog('Updating game pak index.')
+        with TRACER.span( 'update_pak_index', paks = len( pak_paths ) ):
+            self.pak_index.update( pak_paths, pak_stats )
+
+        #Mods are only looked at through their cached manifests here; make_omnipak opens each one once.
+        with TRACER.span( 'scan_mod_paks' ):
+            self.scan_mod_paks()
+
+    def find_game_file(self, filepath):
+        ''' Returns the PakIndexEntry of the game pak member at filepath or None. '''
+        plog( '    Looking up Game Pak Containing File: %s', filepath, progress=True )
+        entry = self.pak_index.find( filepath )
+        if entry:
+            plog( '        Found in Game Pak: %s', entry.pak_path, progress=True )
+        else:
+            plog( '        No Game Pak Contains File.', progress=True )
+
+        return entry
+
+    def make_omnipak(self):
+        plog('')
+        plog( '~=Building omni-mod=~' )
+        plog( 'This may take awhile. Go get a snack and make some coffee.' )
+
+        with TRACER.span( 'plan_omnipak' ):
+            plan = self.plan_omnipak()
+        try:
+            with TRACER.span( 'execute_merge_plan' ):
+                self._execute_merge_plan( plan )
+        finally:
+            plan.close()
+
+    def plan_omnipak(self):
+        ''' Works out, from central directories alone, which vanilla file and which mod members go into every omni-mod file. '''
+        plan = MergePlan()
+        builder = self._omni_mod_builder()
+        for mod_pak_filepath in self.mod_pak_paths:
+            plog('')
+            plog( 'Loading New Mod: %s', mod_pak_filepath )
+
+            with TRACER.span( 'load_mod', mod = os.path.basename( mod_pak_filepath ) ):
+                mod_pak = self._file_to_pak( mod_pak_filepath, lazy = True )
+            if mod_pak is None:
+                continue
+            plan.mod_paks.append( mod_pak )
+
+            #Classified once when the mod's manifest was built by populate_paks.
+            binary = { entry.filename: entry.binary for entry in self.mod_manifests.get( mod_pak_filepath ) }
+
+            for mod_file in mod_pak.files:
+                target = plan.targets.get( mod_file.filepath.lower() )
+                if target is None:
+                    mergeable = not binary.get( mod_file.filepath, mod_file.ext in self.non_mergeable_types )
+                    target = plan.targets[ mod_file.filepath.lower() ] = MergeTarget( mod_file.filepath.lower(),
+                                                                                      self.find_game_file( mod_file.filepath ) if mergeable else None,
+                                                                                      mergeable,
+                                                                                      builder.merges_as_xml( mod_file.filepath ) )
+                target.contributions.append( ( mod_pak_filepath, mod_file ) )
+
+        return plan
+
+    def _execute_merge_plan(self, plan):
+        targets = plan.targets
+
+        previous_manifest = OmniManifest.load( self.omni_manifest_path, self.omni_mod_path, self._merge_settings() )
+        manifest = OmniManifest( self.omni_manifest_path, self._merge_settings() )
+
+        omni_mod = Pak( self.omni_mod_path, lazy = True )
+
+        rebuild_targets = []
+        for target in targets.values():
+            manifest.members[ target.path ] = self._omni_mod_target_inputs( target )
+            if previous_manifest.members.get( target.path ) != manifest.members[ target.path ] or not omni_mod.get_file( target.path ):
+                rebuild_targets.append( target.path )
+
+        if not rebuild_targets and set( previous_manifest.members ) == set( manifest.members ):
+            plog( 'Omni-mod is up to date. Nothing to rebuild.' )
+            omni_mod.close()
+            return
+
+        plog( 'Rebuilding %d of %d omni-mod files.', len( rebuild_targets ), len( targets ) )
+
+        vanilla_cache = VanillaCache()
+        builder = self._omni_mod_builder()
+
+        #Every target's chain of mods stays in load order but different targets are independent,
+        #  so chains that actually need merging are farmed out to worker processes.
+        executor = None
+        if self.jobs > 1:
+            executor = concurrent.futures.ProcessPoolExecutor( max_workers = self.jobs,
+                                                               initializer = _init_merge_worker,
+                                                               initargs = ( self._omni_mod_builder(), TRACER.enabled, plog_file() ) )
+
+        #Merges in write order whose vanilla file hasn't been extracted yet, and those that have, with their worker job if any.
+        pending_merges = collections.deque( target for target in rebuild_targets if targets[ target ].action == 'merge' )
+        merge_jobs = {}
+
+        def schedule_merges():
+            ''' Extracts the vanilla files of the next merges in write order, vanilla_prefetch_size bytes at a time.
+                Each batch is read in one sequential pass per pak and every file is dropped once its target is written.
+            '''
+            scheduled_size = sum( targets[ target ].game_file_entry.file_size for target in merge_jobs )
+            if scheduled_size > self.vanilla_prefetch_size // 2:
+                return
+
+            batch = []
+            while pending_merges and ( not batch or scheduled_size < self.vanilla_prefetch_size ):
+                batch.append( targets[ pending_merges.popleft() ] )
+                scheduled_size += batch[-1].game_file_entry.file_size
+            vanilla_cache.prefetch( target.game_file_entry for target in batch )
+
+            for target in batch:
+                merge_jobs[ target.path ] = None
+                if executor:
+                    merge_jobs[ target.path ] = executor.submit( _merge_worker_build,
+                                                                 [ ( mod_pak_path, mod_file.filepath ) for mod_pak_path, mod_file in target.contributions ],
+                                                                 target.game_file_entry,
+                                                                 vanilla_cache.get( target.game_file_entry ).contents )
+                    vanilla_cache.discard( target.game_file_entry )
+
+        diff_report_writer = None
+        rebuild_targets = set( rebuild_targets )
+        try:
+            #The first submit forks the workers, which has to happen before the diff report writer starts its thread.
+            schedule_merges()
+
+            if self.diff_report_mode != 'off':
+                if not os.path.isdir( self.diff_report_folder ):
+                    os.makedirs( self.diff_report_folder )
+                diff_report_writer = DiffReportWriter( self.diff_report_archive_path, full = self.diff_report_mode == 'full' )
+            elif os.path.exists( self.diff_report_archive_path ):
+                #Reports left over from a build with them turned on no longer describe this omni-mod.
+                os.remove( self.diff_report_archive_path )
+
+            #Each member is written out as soon as it is finalized; the new omni-mod replaces the old one on close.
+            with TRACER.span( 'write_omni_mod', files = len( targets ), rebuilt = len( rebuild_targets ) ), PakWriter( self.omni_mod_path, self.omni_mod_compression ) as omni_mod_writer:
+                for target, merge_target in targets.items():
+                    schedule_merges()
+                    merge_job = merge_jobs.pop( target, None )
+                    if merge_job:
+                        plog( '    Collecting Merged File: %s', target, progress=True )
+                        filepath, file_contents, zip_path, diff_reports, ( trace_events, trace_counters ) = merge_job.result()
+                        TRACER.add_events( trace_events, trace_counters )
+                        omni_mod_writer.write( File( filepath, file_contents, zip_path ) )
+                    elif target in rebuild_targets:
+                        omni_mod_writer.write( builder.build( merge_target.contributions, merge_target.game_file_entry, vanilla_cache ) )
+                        diff_reports, builder.diff_reports = builder.diff_reports, []
+                        if merge_target.action == 'merge':
+                            vanilla_cache.discard( merge_target.game_file_entry )
+                    else:
+                        plog( '    Reusing Unchanged Omni-Mod File: %s', target, progress=True )
+                        previous_file = omni_mod.get_file( target )
+                        omni_mod_writer.write( RawFile( previous_file.filepath, self.omni_mod_path, previous_file.info ) )
+                        diff_reports = []
+                        if diff_report_writer:
+                            diff_report_writer.carry_over( target )
+
+                    if diff_report_writer:
+                        for diff_report in diff_reports:
+                            diff_report_writer.submit( diff_report )
+
+                #The old omni-mod has to be closed before the new one can replace it.
+                omni_mod.close()
+
+            if diff_report_writer:
+                diff_report_writer.close()
+        except:
+            if diff_report_writer:
+                diff_report_writer.abort()
+            raise
+        finally:
+            #Already closed unless a write failed; the old omni-mod mustn't stay mapped either way.
+            omni_mod.close()
+            if executor:
+                executor.shutdown( cancel_futures = True )
+
+            plog( 'Decompressed %d vanilla files (%d cache hits).', vanilla_cache.decompressed, vanilla_cache.hits, level=logging.DEBUG )
+            vanilla_cache.close()
+
+        manifest.save( self.omni_mod_path )
+
+    def _merge_settings(self):
+        #The diff report mode is in here so that changing it rebuilds diff_reports.zip along with the omni-mod.
+        return { 'diff_report_mode': self.diff_report_mode, 'accuracy': self.merge_accuracy, 'area_size': self.merge_area_size, 'non_mergeable_types': self.non_mergeable_types, 'diff_engine': self.diff_engine, 'xml_merge_paths': self.xml_merge_paths, 'compression': self.omni_mod_compression, 'max_merge_memory': self.max_merge_memory }
+
+    def _omni_mod_target_inputs(self, target):
+        ''' Returns what the omni-mod file built for the MergeTarget target depends on, as recorded in the manifest. '''
+        vanilla = None
+        if target.game_file_entry:
+            game_file_entry = target.game_file_entry
+            vanilla = [ os.path.relpath( game_file_entry.pak_path, self.game_files_filepath ), game_file_entry.filename, game_file_entry.CRC, game_file_entry.file_size ]
+
+        return {
+            'mergeable': target.mergeable,
+            'vanilla': vanilla,
+            'mods': [ [ os.path.basename( mod_pak_path ), file.info.filename, file.info.CRC, file.info.file_size ] for mod_pak_path, file in target.contributions ]
+        }
+
+    def _omni_mod_builder(self):
+        return OmniModFileBuilder( self.diff_report_mode,
+                                   self.log_folder_path,
+                                   self.non_mergeable_types,
+                                   self.merge_accuracy,
+                                   self.merge_area_size,
+                                   self.diff_engine,
+                                   self.xml_merge_paths,
+                                   self.max_merge_memory )
+
+    def _sort_mods_by_load_order(self):
+        plog('Sorting mods by load order')
+        mod_pak_paths = self.mod_pak_paths[:]
+        sorted_list = []
+            
+        try:
+            with open(self.load_order_path, 'r') as load_order:
+                load_order = load_order.read().splitlines()
+        except FileNotFoundError:
+            with open(self.load_order_path, 'w') as load_order:
+                #mod_pak_paths already holds every .pak and .zip in the mods folder, in listing order.
+                file_map = [ mod_pak_path[ len( self.mod_files_filepath ): ] for mod_pak_path in mod_pak_paths ]
+                load_order.write( '\n'.join( file_map ) )
+                
+            with open(self.load_order_path, 'r') as load_order:
+                load_order = load_order.read().splitlines()
+
+        for load_order_list_element in load_order:
+            found_mod = False
+
+            for mod_pak_path in mod_pak_paths[:]:
+                if mod_pak_path == self.mod_files_filepath + load_order_list_element:
+                    found_mod = True
+                    sorted_list.append( mod_pak_paths.pop( mod_pak_paths.index(mod_pak_path) ) )
+                    break
+
+            if not found_mod:
+                plog("Warning! Mod in load_order file but not in mods folder. Please delete load_order file after adding or removing mods.")
+
+        if mod_pak_paths:
+            plog("Warning! Mods in mods folder but not in load order file. Please delete load_order file after adding or removing mods.")
+            for _ in range( len( mod_pak_paths[:] ) ):
+                sorted_list.insert(0, mod_pak_paths.pop( 0 ) )
+
+        self.mod_pak_paths = sorted_list
+
+def read_exe_path( config_path = 'config' ):
+    ''' Returns the game exe path recorded in the config file, or None if it has none. '''
+    exe = None
+    with open(config_path, 'r') as file:
+        file = file.read().split('\n')
+        for line in file:
+            line = line.split('=')
+            if line[0] == 'exe_path':
+                exe = line[1]
+    return exe
+
+def get_paths( exe = None ):
+    ''' Works out every path a build needs from the game exe path, read from the config file when exe is None. '''
+    if exe is None:
+        exe = read_exe_path()
+
+    log_folder_path = os.path.dirname( os.path.abspath('__file__') ) + os.sep + 'logs' + os.sep
+    init_plog( log_folder_path )
+    plog( 'exe_path = %s', exe, level=logging.DEBUG )
+
+    path_list = exe.split(os.sep)
+    path_list.pop()
+
+    path_list.append( 'user.cfg' )
+    usercfg = os.sep.join(path_list)
+
+    for i in range(3):
+        path_list.pop()
+
+    path_list.append('Data')
+    data_path = os.sep.join(path_list)
+
+    path_list.pop()
+
+    path_list.append('Localization')
+    localization_path = os.sep.join(path_list)
+
+    mods_path = os.path.dirname( os.path.realpath('__file__') ) + os.sep + 'mods' + os.sep
+
+    if not os.path.exists(mods_path):
+        os.makedirs(mods_path)
+        
+    diff_report_folder_path = os.path.dirname( os.path.realpath('__file__') ) + os.sep + 'diff_reports' + os.sep
+    
+    if not os.path.exists(diff_report_folder_path):
+        os.makedirs(diff_report_folder_path)
+    
+    load_order_path = os.path.dirname( os.path.realpath('__file__') ) + os.sep + 'load_order.txt'
+
+    cache_folder_path = os.path.dirname( os.path.realpath('__file__') ) + os.sep + 'cache' + os.sep
+    
+    plog('load order:', level=logging.DEBUG)
+    if os.path.isfile(load_order_path):
+        with open(load_order_path, 'r') as load_order:
+            for line in load_order.read().splitlines():
+                plog('    %s', line, level=logging.DEBUG)
+    else:
+        plog('    No load order file', level=logging.DEBUG)
+    
+    return usercfg, data_path, localization_path, mods_path, diff_report_folder_path, log_folder_path, load_order_path, cache_folder_path
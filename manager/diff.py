@@ -0,0 +1,632 @@
+import os
+import collections
+import difflib
+import math
+import bisect
+import itertools
+import array
+import logging
+
+from manager.log import plog, stop_plog
+from manager.trace import TRACER
+
+def pop_str( str, index ):
+        try:
+            index = index % len(str)+1
+        except ZeroDivisionError:
+            index = 0
+        return str[:index-1] + str[index:]
+        
+def insert_str( str, index, value ):
+        try:
+            index = index % len(str)+1
+        except ZeroDivisionError:
+            index = 0
+        return str[:index-1] + value + str[index:]
+
+
+DiffHunk = collections.namedtuple( 'DiffHunk', [ 'orig_start', 'orig_end', 'mod_start', 'mod_end' ] )
+
+def sequence_matcher_diff( orig, mod ):
+    ''' Diffs two lists of line ids with difflib.SequenceMatcher; returns a list of DiffHunks. '''
+    return [ DiffHunk( i1, i2, j1, j2 )
+             for tag, i1, i2, j1, j2 in difflib.SequenceMatcher( None, orig, mod, autojunk=False ).get_opcodes() if tag != 'equal' ]
+
+def _unique_common_lines( orig, orig_start, orig_end, mod, mod_start, mod_end ):
+    ''' Returns the longest run of ( orig index, mod index ) pairs of lines occurring exactly once on both sides that are in the same order on both sides. '''
+    counts = {}
+    for i in range( orig_start, orig_end ):
+        count = counts.get( orig[ i ] )
+        counts[ orig[ i ] ] = [ 1, 0, i ] if count is None else [ count[0]+1, 0, i ]
+    for j in range( mod_start, mod_end ):
+        count = counts.get( mod[ j ] )
+        if count is not None:
+            count[ 1 ] += 1
+            count.append( j )
+
+    pairs = sorted( ( count[2], count[3] ) for count in counts.values() if count[0] == 1 and count[1] == 1 )
+
+    #Patience sorting; piles[ k ] is the index in pairs of the smallest mod index ending a run of length k+1.
+    piles = []
+    pile_tops = []
+    backpointers = []
+    for n, ( i, j ) in enumerate( pairs ):
+        k = bisect.bisect_left( pile_tops, j )
+        backpointers.append( piles[ k-1 ] if k else None )
+        if k == len( piles ):
+            piles.append( n )
+            pile_tops.append( j )
+        else:
+            piles[ k ] = n
+            pile_tops[ k ] = j
+
+    run = []
+    n = piles[ -1 ] if piles else None
+    while n is not None:
+        run.append( pairs[ n ] )
+        n = backpointers[ n ]
+    run.reverse()
+    return run
+
+def patience_diff( orig, mod ):
+    ''' Diffs two lists of line ids with the patience algorithm; returns a list of DiffHunks. '''
+    hunks = []
+    regions = [ ( 0, len( orig ), 0, len( mod ) ) ]
+    while regions:
+        orig_start, orig_end, mod_start, mod_end = regions.pop()
+
+        while orig_start < orig_end and mod_start < mod_end and orig[ orig_start ] == mod[ mod_start ]:
+            orig_start += 1
+            mod_start += 1
+        while orig_start < orig_end and mod_start < mod_end and orig[ orig_end-1 ] == mod[ mod_end-1 ]:
+            orig_end -= 1
+            mod_end -= 1
+
+        if orig_start == orig_end or mod_start == mod_end:
+            if orig_start != orig_end or mod_start != mod_end:
+                hunks.append( DiffHunk( orig_start, orig_end, mod_start, mod_end ) )
+            continue
+
+        anchors = _unique_common_lines( orig, orig_start, orig_end, mod, mod_start, mod_end )
+        if not anchors:
+            for hunk in sequence_matcher_diff( orig[ orig_start:orig_end ], mod[ mod_start:mod_end ] ):
+                hunks.append( DiffHunk( hunk.orig_start+orig_start, hunk.orig_end+orig_start, hunk.mod_start+mod_start, hunk.mod_end+mod_start ) )
+            continue
+
+        #Push the regions between anchors in reverse so they pop off in order.
+        sub_regions = []
+        for i, j in anchors:
+            sub_regions.append( ( orig_start, i, mod_start, j ) )
+            orig_start, mod_start = i+1, j+1
+        sub_regions.append( ( orig_start, orig_end, mod_start, mod_end ) )
+        regions.extend( reversed( sub_regions ) )
+
+    return hunks
+
+DIFF_ENGINES = {
+    'patience': patience_diff,
+    'difflib': sequence_matcher_diff
+}
+
+class LineTable( object ):
+    ''' Interns every distinct line once so files can be handled as array( 'I' ) sequences of line ids.
+
+        One table is shared by every merge of a target file, so the vanilla file and the omni-mod file
+        are only split and hashed once for the whole mod chain; text is rebuilt by decode.
+    '''
+    #How many encoded files are remembered by identity so a text seen again isn't split again.
+    remembered = 4
+
+    def __init__(self):
+        self.ids = {}
+        self.lines = []
+        self._encoded = collections.OrderedDict()
+
+    def __len__(self):
+        return len( self.lines )
+
+    def intern(self, line):
+        line_id = self.ids.get( line )
+        if line_id is None:
+            line_id = self.ids[ line ] = len( self.lines )
+            self.lines.append( line )
+        return line_id
+
+    def encode(self, text, remember = True):
+        ''' Returns the lines of text as an array of line ids. The array may be shared, copy it before changing it. '''
+        key = id( text )
+        encoded = self._encoded.get( key )
+        if encoded is not None and encoded[0] is text:
+            self._encoded.move_to_end( key )
+            return encoded[1]
+
+        line_ids = array.array( 'I', map( self.intern, iter_lines( text ) ) )
+        if remember:
+            self.remember( text, line_ids )
+        return line_ids
+
+    def remember(self, text, line_ids):
+        ''' Records that text encodes to line_ids; keeps text alive so its id can't be reused meanwhile. '''
+        self._encoded[ id( text ) ] = ( text, line_ids )
+        self._encoded.move_to_end( id( text ) )
+        while len( self._encoded ) > self.remembered:
+            self._encoded.popitem( last = False )
+
+    def decode(self, line_ids):
+        lines = self.lines
+        return '\n'.join( [ lines[ line_id ] for line_id in line_ids ] )
+
+class LineIndex( object ):
+    ''' Index of the distinct lines of a file, used to find candidate lines without scanning the whole file.
+        Lines are LineTable ids; the n-grams and lengths are those of the lines' text.
+    '''
+    ngram_size = 3
+
+    def __init__( self, line_ids, line_table ):
+        self.text = line_table.lines
+        self.lines = set()
+        self.ngrams = collections.defaultdict( set )
+        self.lengths = collections.defaultdict( set )
+
+        self.add( line_ids )
+
+    def add( self, line_ids ):
+        for line in line_ids:
+            if line not in self.lines:
+                self.lines.add( line )
+                text = self.text[ line ]
+                self.lengths[ len( text ) ].add( line )
+                for ngram in self.line_ngrams( text ):
+                    self.ngrams[ ngram ].add( line )
+
+    @classmethod
+    def line_ngrams( cls, line ):
+        if len( line ) <= cls.ngram_size:
+            return { line }
+        return { line[ i:i+cls.ngram_size ] for i in range( len( line ) - cls.ngram_size + 1 ) }
+
+    def candidates( self, line, limit ):
+        ''' Returns up to limit indexed lines sharing the most character n-grams with line, best first. '''
+        counts = collections.Counter()
+        for ngram in self.line_ngrams( self.text[ line ] ):
+            counts.update( self.ngrams.get( ngram, () ) )
+        return [ candidate for candidate, _ in counts.most_common( limit ) ]
+
+    def lines_near_length( self, length, how_similar ):
+        ''' Yields the indexed lines whose length alone doesn't rule out being how_similar percent similar to a line of length. '''
+        how_similar = how_similar - 0.1
+        if how_similar <= 0:
+            shortest, longest = 0, float( 'inf' )
+        else:
+            shortest = math.floor( length * how_similar / ( 200 - how_similar ) )
+            longest = math.ceil( length * ( 200 - how_similar ) / how_similar )
+
+        for line_length, lines in self.lengths.items():
+            if shortest <= line_length <= longest:
+                yield from lines
+
+def iter_lines( text ):
+    ''' Yields the lines of text one at a time; the same lines as text.split( '\\n' ) without building the list. '''
+    start = 0
+    while True:
+        end = text.find( '\n', start )
+        if end < 0:
+            yield text[ start: ]
+            return
+        yield text[ start:end ]
+        start = end + 1
+
+class DiffCombiner( object ):
+    #Rough bytes of Python objects per character of text merged; the LineIndex n-gram sets dominate.
+    merge_memory_per_char = 200
+
+    def __init__( self, diff_report_mode, original_game_file, mod_file, omni_mod_file, mod_pak_name, log_folder_path, accuracy, area_size, diff_engine = 'patience', max_merge_memory = None, line_table = None ):
+        #One of DIFF_REPORT_MODES; the full report text is only built in 'full'.
+        self.diff_report_mode = diff_report_mode
+        self.diff_report = None
+        self.diff_summary = None
+        
+        self.log_folder_path = log_folder_path
+        if self.log_folder_path[-1] != os.sep:
+            self.log_folder_path += os.sep
+            
+        self.reindent = False
+        
+        self.accuracy = accuracy
+        self.area_size = area_size
+        self.diff_engine = diff_engine
+        
+        if self.area_size % 2 != 1:
+            self.area_size += 1
+        
+        self.mod_pak_name = mod_pak_name.split(os.sep)[-1]
+        
+        self.mod_file = mod_file
+        self.mod_file_path = self.mod_file.filepath
+        
+        '''
+        #Makes sure every indentation is 4 spaces (as opposed to 1 space or 2 spaces)
+        if self.mod_file_path[-4:] == '.xml':
+            self.mod_file = reindentXmlString( self.mod_file ).splitlines( keepends=True )
+        '''
+        self.original_file = original_game_file.contents
+        
+        '''
+        #Makes sure every indentation is 4 spaces (as opposed to 1 space or 2 spaces)
+        if self.mod_file_path[-4:] == '.xml':
+            self.original_file = reindentXmlString( self.original_file ).splitlines( keepends=True )
+        '''
+        self.omni_mod_file = omni_mod_file.contents
+
+        #Bytes a merge may use before combine switches to windowed merging; None is unlimited.
+        self.max_merge_memory = max_merge_memory
+
+        #Lines are compared as ids of this LineTable; pass the same one to every merge of a target file.
+        self.line_table = line_table if line_table is not None else LineTable()
+        self._pad = self.line_table.intern( ' ' )
+
+        self._similarities = {}
+        self._matchers = {}
+        #Most entries _similarities and _matchers may hold before they are dropped; None is unlimited.
+        self._cache_limit = None
+        self._line_index = None
+        self._line_index_file = None
+
+    def estimated_merge_memory( self ):
+        return self.merge_memory_per_char * ( len( self.original_file ) + len( self.omni_mod_file or '' ) + len( self.mod_file.contents ) )
+
+    def diff_hunks( self, orig = None, mod = None ):
+        ''' Diffs the original file against the mod file; returns the DiffHunks and fills in diff_summary and, in 'full' mode, diff_report.
+            orig and mod are the files' line ids if the caller already has them.
+        '''
+        if orig is None:
+            orig = self.line_table.encode( self.original_file )
+        if mod is None:
+            mod = self.line_table.encode( self.mod_file.contents )
+
+        hunks = DIFF_ENGINES[ self.diff_engine ]( orig, mod )
+
+        if hunks:
+            self.diff_summary = { 'hunks': len( hunks ),
+                                  'removed': sum( hunk.orig_end - hunk.orig_start for hunk in hunks ),
+                                  'added': sum( hunk.mod_end - hunk.mod_start for hunk in hunks ) }
+
+        if hunks and self.diff_report_mode == 'full':
+            d = []
+            for hunk in hunks:
+                d.append( '@@ -{0},{1} +{2},{3} @@'.format( hunk.orig_start+1, hunk.orig_end-hunk.orig_start, hunk.mod_start+1, hunk.mod_end-hunk.mod_start ) )
+                d.extend( '- ' + self.line_table.lines[ line ] for line in orig[ hunk.orig_start:hunk.orig_end ] )
+                d.extend( '+ ' + self.line_table.lines[ line ] for line in mod[ hunk.mod_start:hunk.mod_end ] )
+
+            self.diff_report = '\n'.join( d )
+
+        return hunks
+
+    def similarity(self, line1, line2):
+        ''' returns how similar two lines ( line ids ) are as a percentage '''
+        try:
+            return self._similarities[ ( line1, line2 ) ]
+        except KeyError:
+            pass
+
+        sequence = self._get_matcher( line2 )
+        sequence.set_seq1( self.line_table.lines[ line1 ] )
+        TRACER.count( 'sequence_matcher_calls' )
+        difference = sequence.ratio()*100
+        difference = round( difference, 1 )
+
+        if self._cache_limit is not None and len( self._similarities ) >= self._cache_limit:
+            self._similarities.clear()
+        self._similarities[ ( line1, line2 ) ] = difference
+        return difference
+
+    def _get_matcher(self, line2):
+        ''' SequenceMatcher caches everything it learns about b, so keep one around per line compared against. '''
+        sequence = self._matchers.get( line2 )
+        if sequence is None:
+            if self._cache_limit is not None and len( self._matchers ) >= self._cache_limit:
+                self._matchers.clear()
+            sequence = self._matchers[ line2 ] = difflib.SequenceMatcher(isjunk=None, a='', b=self.line_table.lines[ line2 ])
+        return sequence
+
+    def _get_line_index(self, file):
+        if self._line_index_file is not file:
+            self._line_index = LineIndex( file, self.line_table )
+            self._line_index_file = file
+        return self._line_index
+
+    def _similarities_at_least(self, line, candidates, how_similar):
+        ''' Returns { candidate: similarity } for every candidate at least how_similar to line.
+            real_quick_ratio and quick_ratio are upper bounds of ratio so they rule most candidates out cheaply.
+        '''
+        similarities = {}
+        lines = self.line_table.lines
+        text = lines[ line ]
+        length = len( text )
+        for candidate in candidates:
+            candidate_length = len( lines[ candidate ] )
+            total_length = length + candidate_length
+            if total_length and round( 2.0 * min( length, candidate_length ) / total_length * 100, 1 ) < how_similar:
+                continue
+
+            sequence = self._get_matcher( candidate )
+            sequence.set_seq1( text )
+            if round( sequence.quick_ratio() * 100, 1 ) < how_similar:
+                continue
+
+            similarity = self.similarity( line, candidate )
+            if similarity >= how_similar:
+                similarities[ candidate ] = similarity
+
+        return similarities
+        
+    def most_similar_to(self, line, file):
+        ''' returns the index of the line in file ( line ids ) that is most similar to line ( a line id ) '''
+        how_similar_most_similar_line_is = -1
+        most_similar_line_index = -1
+
+        for i in range( len( file ) ):
+            similarity = self.similarity( line, file[i] )
+            if similarity > how_similar_most_similar_line_is:
+                how_similar_most_similar_line_is = similarity
+                most_similar_line_index = i
+
+        if most_similar_line_index < 0:
+            plog( 'Something went terribly wrong in; DiffCombiner.most_similar_to(line, file).'\
+                     'Please remove \'{0}\' from mods folder and file a bug report on nexus mods.'\
+                     'Please remember to include your \'logs\' folder located in {1}.'.format( self.mod_pak_name, self.log_folder_path ) )
+            plog( 'most_similar_line_index = {0}.\nline = {1}\nfile = {2}'.format( most_similar_line_index, 
+                                                                                                                self.line_table.lines[ line ], 
+                                                                                                                self.mod_file.filepath ), level=logging.DEBUG )
+            stop_plog()
+            input('Press Enter/Return to close...')
+            assert False
+        
+        return most_similar_line_index
+        
+    def find_top_matching_lines( self, line, file ):
+        ''' Returns, newest first, the last self.accuracy lines of file that are at least as similar to line
+            as every line before them; padded with a None index when there are fewer of them.
+
+            Works backwards from a similarity threshold: lines at or above it are exact records, and
+            only the part of the file before the first of them needs a lower threshold.
+        '''
+        index = self._get_line_index( file )
+
+        seeds = sorted( [ self.similarity( line, candidate ) for candidate in index.candidates( line, self.accuracy * 4 ) ], reverse = True )
+        threshold = seeds[ min( self.accuracy, len( seeds ) ) - 1 ] if seeds else 0
+
+        similarities = [ ]
+        candidates = index.lines_near_length( len( self.line_table.lines[ line ] ), threshold )
+        end = len( file )
+        while end and len( similarities ) < self.accuracy:
+            scores = self._similarities_at_least( line, candidates, threshold )
+            matches = [ i for i in range( end ) if file[ i ] in scores ]
+
+            if matches:
+                records = [ ]
+                for i in matches:
+                    similarity = scores[ file[ i ] ]
+                    if not records or similarity >= records[ -1 ][ 'how_similar' ]:
+                        records.append( {
+                            'how_similar': similarity,
+                            'index': i
+                        } )
+                records.reverse()
+                similarities.extend( records )
+                end = matches[ 0 ]
+
+            if threshold <= 0:
+                break
+            threshold = max( 0, threshold - 10 )
+            candidates = set( file[ :end ] )
+
+        if len( similarities ) >= self.accuracy:
+            return similarities[ :self.accuracy ]
+
+        similarities.append( {
+            'how_similar': -1,
+            'index': None
+            } )
+        return similarities
+        
+    def compare_areas( self, area1, area2 ):
+        if len(area1) != len(area2):
+            assert False, 'len( area1 ) and len( area2 ) must be of same size.'
+        
+        similarities_list = [ ]
+        for i in range( len( area1 ) ):
+            similarities_list.append( self.similarity( area1[ i ], area2[ i ] ) )
+            
+        return sum( similarities_list )
+        
+    def most_similar_area( self, area, file ):
+        area_size = len( area )
+        
+        if area_size % 2 != 1:
+            assert False, 'len( area ) MUST be odd.'
+            
+        line = area[ math.floor( area_size/2 ) ]
+        
+        top_matches = self.find_top_matching_lines( line, file )
+        
+        best_area = {
+            'how_similar': -1,
+            'index': -1
+        }
+
+        for i in range( len( top_matches ) ):
+            match = top_matches[ i ]
+            match_line_number = match[ 'index' ]
+            if match_line_number is not None:
+            
+                match_area = self.get_area( len( area ), file, match[ 'index' ] )
+                
+                comp = self.compare_areas( area, match_area )
+                
+                if comp >= best_area[ 'how_similar' ]:
+                    best_area[ 'how_similar' ] = comp
+                    best_area[ 'index' ] = match_line_number
+
+        return best_area[ 'index' ]
+        
+        ''' Takes an even length list of lines as area and another list of lines as file returns the middle point'''
+        '''
+        how_similar_most_similar_area_is = -1
+        most_similar_area_center_line_index = -1
+        
+        if len(area) % 2 == 0:
+            plog( 'Something went terribly wrong in; DiffCombiner.most_similar_area(area, file), len(area) is even? what?'
+                     'Please remove \'{0}\' from mods folder and file a bug report on nexus mods including:'\
+                     'Please remember to include your \'logs\' folder located in {1}.'.format( self.mod_pak_name, self.log_folder_path ) )
+            plog( 'area = {0}.\file = {1}'.format( area, self.mod_file.filepath ), level=logging.DEBUG )
+            stop_plog()
+            input('Press Enter/Return to close...')
+            assert False
+            
+        for _ in range( math.floor( len(area)/2 ) ):
+            file.insert(0, ' ')
+
+        for _ in range( math.floor( len(area)/2 ) ):
+            file.append(' ')
+
+        for i in range(math.floor( len(area)/2 )+1, len(file) ):
+            diff_perc = [ -1 for _ in range( len( area ) ) ]
+
+            for line in file:
+                for j in range( len( area ) ):
+                    aline = area[ j ]
+                    diff_perc[ j ] = self.similarity(aline, line)
+
+            for j in range( 1, len( diff_perc ) ):
+                diff_perc[0] += diff_perc[ j ]
+
+            if diff_perc[0] > how_similar_most_similar_area_is:
+                how_similar_most_similar_area_is = diff_perc[0]
+                most_similar_area_center_line_index = i - math.floor( len(area)/2 )
+
+        return most_similar_area_center_line_index
+        '''
+        
+    def get_area( self, area_size, file, line_number ):
+        ''' Returns the area_size lines of file centred on line_number, padded with ' ' past either end of file. '''
+        if area_size % 2 != 1:
+            assert False, 'area_size MUST be odd'
+
+        half = math.floor( area_size/2 )
+        length = len( file )
+        return [ file[ i ] if 0 <= i < length else self._pad for i in range( line_number - half, line_number + half + 1 ) ]
+        
+    def combine(self):
+        if self.max_merge_memory is not None and self.estimated_merge_memory() > self.max_merge_memory:
+            return self.combine_windowed()
+
+        with TRACER.span( 'DiffCombiner.diff', file = self.mod_file_path, mod = self.mod_pak_name ):
+            hunks = self.diff_hunks()
+
+        if self.omni_mod_file:
+            new_file = self.omni_mod_file
+        else:
+            new_file = self.original_file
+        
+        #The encoded arrays are shared through the line table so new has to be a copy.
+        new = array.array( 'I', self.line_table.encode( new_file ) )
+        orig = self.line_table.encode( self.original_file )
+        mod = self.line_table.encode( self.mod_file.contents )
+
+        #new only ever gains lines from mod so one index covers it for the whole combine.
+        self._line_index = LineIndex( itertools.chain( new, mod ), self.line_table )
+        self._line_index_file = new
+
+        with TRACER.span( 'DiffCombiner.apply', file = self.mod_file_path, mod = self.mod_pak_name, hunks = len( hunks ) ):
+            for hunk in hunks:
+                with TRACER.span( 'DiffCombiner.anchor', removed = hunk.orig_end - hunk.orig_start, added = hunk.mod_end - hunk.mod_start ):
+                    for orig_line_number in range( hunk.orig_start, hunk.orig_end ):
+                        orig_area = self.get_area( self.area_size, orig, orig_line_number )
+                        olinei = self.most_similar_area( orig_area, new )
+                        new.pop( olinei )
+
+                    for mod_line_number in range( hunk.mod_start, hunk.mod_end ):
+                        mod_area = self.get_area( self.area_size, mod, mod_line_number )
+                        mlinei = self.most_similar_area( mod_area, new )
+                        new.insert( mlinei, mod[ mod_line_number ] )
+        
+        return self._decode( new )
+
+    def _decode( self, new ):
+        ''' Turns the merged line ids back into text, remembering them in case the text is the next merge's omni-mod file. '''
+        text = self.line_table.decode( new )
+        self.line_table.remember( text, new )
+        return text
+
+    def combine_windowed(self):
+        ''' combine for files too big for max_merge_memory.
+
+            Each hunk is only anchored within the window of the omni-mod file between the unchanged lines
+            around it, so the LineIndex and the similarity caches only ever cover one window instead of the
+            whole file. The texts and their line ids all stay in memory; the LineIndex is what outgrows them.
+            A line can land in a different place than combine would put it, since combine may anchor it
+            anywhere in the file, so the output is not guaranteed to match an unbounded merge.
+        '''
+        orig = self.line_table.encode( self.original_file, remember = False )
+        mod = self.line_table.encode( self.mod_file.contents, remember = False )
+        try:
+            with TRACER.span( 'DiffCombiner.diff', file = self.mod_file_path, mod = self.mod_pak_name, windowed = True ):
+                hunks = self.diff_hunks( orig, mod )
+
+            new = array.array( 'I', self.line_table.encode( self.omni_mod_file or self.original_file, remember = False ) )
+            anchor_orig, anchor_new = self._unchanged_lines( orig, new )
+
+            self._cache_limit = max( 1024, self.max_merge_memory // ( self.merge_memory_per_char * 64 ) )
+            margin = self.area_size + self.accuracy
+            shift = 0
+
+            with TRACER.span( 'DiffCombiner.apply', file = self.mod_file_path, mod = self.mod_pak_name, hunks = len( hunks ), windowed = True ):
+                for hunk in hunks:
+                    #The window runs from the last unchanged line before the hunk to the first one after it,
+                    #  moved by whatever earlier hunks added to or removed from new.
+                    before = bisect.bisect_left( anchor_orig, hunk.orig_start )
+                    after = bisect.bisect_left( anchor_orig, hunk.orig_end )
+                    start = max( 0, ( anchor_new[ before-1 ] if before else 0 ) + shift - margin )
+                    end = min( len( new ), ( anchor_new[ after ] if after < len( anchor_new ) else len( new ) ) + shift + margin + 1 )
+
+                    with TRACER.span( 'DiffCombiner.anchor', removed = hunk.orig_end - hunk.orig_start, added = hunk.mod_end - hunk.mod_start, window = end - start ):
+                        for orig_line_number in range( hunk.orig_start, hunk.orig_end ):
+                            window = new[ start:end ]
+                            if not window:
+                                break
+                            orig_area = self.get_area( self.area_size, orig, orig_line_number )
+                            olinei = self.most_similar_area( orig_area, window )
+                            new.pop( start + olinei )
+                            end -= 1
+                            shift -= 1
+
+                        for mod_line_number in range( hunk.mod_start, hunk.mod_end ):
+                            mod_area = self.get_area( self.area_size, mod, mod_line_number )
+                            window = new[ start:end ]
+                            mlinei = self.most_similar_area( mod_area, window ) if window else 0
+                            new.insert( start + mlinei, mod[ mod_line_number ] )
+                            end += 1
+                            shift += 1
+        finally:
+            self._similarities.clear()
+            self._matchers.clear()
+            self._line_index = None
+            self._line_index_file = None
+
+        return self.line_table.decode( new )
+
+    def _unchanged_lines( self, orig, new ):
+        ''' Returns two parallel arrays of the orig and new indexes of every line the omni-mod file kept unchanged from orig. '''
+        anchor_orig = array.array( 'I' )
+        anchor_new = array.array( 'I' )
+        i = j = 0
+        for hunk in DIFF_ENGINES[ self.diff_engine ]( orig, new ) + [ DiffHunk( len( orig ), len( orig ), len( new ), len( new ) ) ]:
+            while i < hunk.orig_start:
+                anchor_orig.append( i )
+                anchor_new.append( j )
+                i += 1
+                j += 1
+            i, j = hunk.orig_end, hunk.mod_end
+
+        return anchor_orig, anchor_new
@@ -0,0 +1,293 @@
+import os
+import json
+import collections
+import concurrent.futures
+import logging
+
+from manager.log import plog
+from manager.trace import TRACER
+from manager.pak import PakFile, File
+
+PakIndexEntry = collections.namedtuple( 'PakIndexEntry', [ 'pak_path', 'filename', 'header_offset', 'compress_size', 'file_size', 'CRC' ] )
+
+class PakIndex( object ):
+    ''' Persistent index of every game pak's central directory.
+
+        Maps each lowercased member path to a PakIndexEntry. Paks are keyed by their size and
+        mtime so only paks the game has changed since the last run get rescanned.
+    '''
+    version = 1
+
+    def __init__( self, index_path ):
+        self.index_path = index_path
+        self.paks = {}
+        self.members = {}
+        self._dirty = False
+
+        self._load()
+
+    def _load( self ):
+        try:
+            with open( self.index_path, 'r' ) as index_file:
+                index = json.load( index_file )
+        except ( OSError, ValueError ):
+            return
+
+        if index.get( 'version' ) == self.version:
+            self.paks = index.get( 'paks', {} )
+            self._rebuild_members()
+
+    def save( self ):
+        if not self._dirty:
+            return
+
+        index_folder = os.path.dirname( self.index_path )
+        if index_folder and not os.path.exists( index_folder ):
+            os.makedirs( index_folder )
+
+        tmp_path = self.index_path + '.tmp'
+        with open( tmp_path, 'w' ) as index_file:
+            json.dump( { 'version': self.version, 'paks': self.paks }, index_file )
+        os.replace( tmp_path, self.index_path )
+
+        self._dirty = False
+
+    def update( self, pak_paths, stats = None ):
+        ''' Rescans every pak in pak_paths whose size or mtime changed and forgets paks that are gone.
+
+            stats optionally maps pak paths to stat results the caller already has (from os.scandir)
+            so they are not statted again. Changed paks have their central directories read on a thread pool.
+        '''
+        pak_paths = list( pak_paths )
+        stats = stats or {}
+
+        wanted = set( pak_paths )
+        for pak_path in list( self.paks ):
+            if pak_path not in wanted:
+                del self.paks[ pak_path ]
+                self._dirty = True
+
+        changed = {}
+        for pak_path in pak_paths:
+            stat = stats.get( pak_path ) or os.stat( pak_path )
+            cached = self.paks.get( pak_path )
+            if cached and cached[ 'size' ] == stat.st_size and cached[ 'mtime' ] == stat.st_mtime_ns:
+                continue
+            changed[ pak_path ] = stat
+
+        if changed:
+            with concurrent.futures.ThreadPoolExecutor() as executor:
+                for pak_path, members in zip( changed, executor.map( self._scan_pak, changed ) ):
+                    plog( '    Indexing Game Pak: %s', pak_path, level=logging.DEBUG )
+                    self.paks[ pak_path ] = {
+                        'size': changed[ pak_path ].st_size,
+                        'mtime': changed[ pak_path ].st_mtime_ns,
+                        'members': members
+                    }
+            self._dirty = True
+
+        self._rebuild_members()
+        self.save()
+
+    def _scan_pak( self, pak_path ):
+        #Plain reads rather than a map so the scanning threads don't wait on each other's page faults.
+        pak = PakFile( pak_path, mapped = False )
+        members = [ [ member.filename, member.header_offset, member.compress_size, member.file_size, member.CRC ]
+                    for member in pak.infolist() if '.' in member.filename ]
+        pak.close()
+        return members
+
+    def _rebuild_members( self ):
+        self.members = {}
+        #The first pak (in sorted order) holding a member wins.
+        for pak_path in sorted( self.paks ):
+            for filename, header_offset, compress_size, file_size, crc in self.paks[ pak_path ][ 'members' ]:
+                key = '/'.join( filename.split( '\\' ) ).lower()
+                if key not in self.members:
+                    self.members[ key ] = PakIndexEntry( pak_path, filename, header_offset, compress_size, file_size, crc )
+
+    def find( self, filepath ):
+        ''' Returns the PakIndexEntry for filepath or None if no game pak holds it. '''
+        return self.members.get( '/'.join( filepath.split( '\\' ) ).lower() )
+
+    def __contains__( self, filepath ):
+        return self.find( filepath ) is not None
+
+ModManifestEntry = collections.namedtuple( 'ModManifestEntry', [ 'filename', 'file_size', 'CRC', 'binary' ] )
+
+class ModManifestCache( object ):
+    ''' Persistent manifest of every mod pak: each member's path, size, CRC and whether it is carried as binary.
+
+        Like PakIndex, mods are keyed by their size and mtime so a mod is only rescanned after it changed,
+        and rescans only read the central directory. Changing the non-mergeable types reclassifies
+        members without rescanning anything.
+    '''
+    version = 1
+
+    def __init__( self, cache_path ):
+        self.cache_path = cache_path
+        self.mods = {}
+        self.non_mergeable_types = None
+        self._dirty = False
+
+        self._load()
+
+    def _load( self ):
+        try:
+            with open( self.cache_path, 'r' ) as cache_file:
+                cache = json.load( cache_file )
+        except ( OSError, ValueError ):
+            return
+
+        if cache.get( 'version' ) == self.version:
+            self.mods = cache.get( 'mods', {} )
+            self.non_mergeable_types = cache.get( 'non_mergeable_types' )
+
+    def save( self ):
+        if not self._dirty:
+            return
+
+        cache_folder = os.path.dirname( self.cache_path )
+        if cache_folder and not os.path.exists( cache_folder ):
+            os.makedirs( cache_folder )
+
+        tmp_path = self.cache_path + '.tmp'
+        with open( tmp_path, 'w' ) as cache_file:
+            json.dump( { 'version': self.version, 'non_mergeable_types': self.non_mergeable_types, 'mods': self.mods }, cache_file )
+        os.replace( tmp_path, self.cache_path )
+
+        self._dirty = False
+
+    @staticmethod
+    def is_binary( filename, non_mergeable_types ):
+        return filename.split( '.' )[-1] in non_mergeable_types
+
+    def update( self, mod_pak_paths, non_mergeable_types, stats = None, progress = None ):
+        ''' Rescans every .pak in mod_pak_paths whose size or mtime changed and forgets mods that are gone.
+            stats optionally maps mod pak paths to stat results the caller already has.
+            progress, if given, is called as progress( done, total ) as mod paks are accounted for.
+        '''
+        mod_pak_paths = [ mod_pak_path for mod_pak_path in mod_pak_paths if mod_pak_path[-4:] == '.pak' ]
+        stats = stats or {}
+
+        wanted = set( mod_pak_paths )
+        for mod_pak_path in list( self.mods ):
+            if mod_pak_path not in wanted:
+                del self.mods[ mod_pak_path ]
+                self._dirty = True
+
+        if self.non_mergeable_types != list( non_mergeable_types ):
+            self.non_mergeable_types = list( non_mergeable_types )
+            for mod in self.mods.values():
+                for member in mod[ 'members' ]:
+                    member[ 3 ] = self.is_binary( member[ 0 ], self.non_mergeable_types )
+            self._dirty = True
+
+        changed = {}
+        for mod_pak_path in mod_pak_paths:
+            stat = stats.get( mod_pak_path ) or os.stat( mod_pak_path )
+            cached = self.mods.get( mod_pak_path )
+            if cached and cached[ 'size' ] == stat.st_size and cached[ 'mtime' ] == stat.st_mtime_ns:
+                continue
+            changed[ mod_pak_path ] = stat
+
+        #Unchanged mods are done already.
+        done = len( mod_pak_paths ) - len( changed )
+        if progress:
+            progress( done, len( mod_pak_paths ) )
+
+        if changed:
+            with concurrent.futures.ThreadPoolExecutor() as executor:
+                for mod_pak_path, members in zip( changed, executor.map( self._scan_mod_pak, changed ) ):
+                    plog( '    Scanning Mod Pak: %s', mod_pak_path, level=logging.DEBUG )
+                    self.mods[ mod_pak_path ] = {
+                        'size': changed[ mod_pak_path ].st_size,
+                        'mtime': changed[ mod_pak_path ].st_mtime_ns,
+                        'members': members
+                    }
+                    done += 1
+                    if progress:
+                        progress( done, len( mod_pak_paths ) )
+            self._dirty = True
+
+        self.save()
+
+    def _scan_mod_pak( self, mod_pak_path ):
+        with PakFile( mod_pak_path, mapped = False ) as pak:
+            return [ [ member.filename, member.file_size, member.CRC, self.is_binary( member.filename, self.non_mergeable_types ) ]
+                     for member in pak.infolist() if '.' in member.filename ]
+
+    def get( self, mod_pak_path ):
+        ''' Returns the ModManifestEntries of the mod pak at mod_pak_path, or an empty list if it was never scanned. '''
+        mod = self.mods.get( mod_pak_path )
+        if mod is None:
+            return []
+        return [ ModManifestEntry( *member ) for member in mod[ 'members' ] ]
+
+class VanillaCache( object ):
+    ''' Build-scoped, content-addressed cache of decompressed vanilla game files.
+
+        Files are keyed by ( pak path, member name, CRC ) so each vanilla file is decompressed
+        at most once per build no matter how many mods touch it.
+    '''
+    def __init__(self):
+        self.paks = {}
+        self.files = {}
+        self.decompressed = 0
+        self.hits = 0
+
+    @staticmethod
+    def key(entry):
+        return ( entry.pak_path, entry.filename.lower(), entry.CRC )
+
+    def _get_pak(self, pak_path):
+        pak = self.paks.get( pak_path )
+        if pak is None:
+            pak = self.paks[ pak_path ] = PakFile( pak_path )
+        return pak
+
+    def _extract(self, pak, entry):
+        file = File( entry.filename, str( pak.view( entry.filename ), 'latin-1' ), entry.pak_path )
+        self.files[ self.key( entry ) ] = file
+        self.decompressed += 1
+        return file
+
+    def get(self, entry):
+        ''' Returns a File holding the vanilla contents of the PakIndexEntry entry. '''
+        file = self.files.get( self.key( entry ) )
+        if file is not None:
+            self.hits += 1
+            return file
+
+        with TRACER.span( 'VanillaCache.extract', file = entry.filename, pak = entry.pak_path ):
+            return self._extract( self._get_pak( entry.pak_path ), entry )
+
+    def discard(self, entry):
+        ''' Drops the contents of entry once nothing needs them any more. '''
+        self.files.pop( self.key( entry ), None )
+
+    def put(self, entry, contents):
+        ''' Seeds the cache with contents that were already extracted elsewhere. '''
+        self.files[ self.key( entry ) ] = File( entry.filename, contents, entry.pak_path )
+
+    def prefetch(self, entries):
+        ''' Extracts every entry not cached yet, opening each game pak once and reading its
+            members in ascending header_offset order so the disk sees one sequential pass.
+        '''
+        needed = {}
+        for entry in entries:
+            if self.key( entry ) not in self.files:
+                needed.setdefault( entry.pak_path, {} )[ self.key( entry ) ] = entry
+
+        for pak_path in sorted( needed ):
+            plog( '    Extracting %d Game Files from: %s', len( needed[ pak_path ] ), pak_path, progress=True )
+            with TRACER.span( 'VanillaCache.prefetch', pak = pak_path, files = len( needed[ pak_path ] ) ):
+                pak = self._get_pak( pak_path )
+                for entry in sorted( needed[ pak_path ].values(), key = lambda entry: entry.header_offset ):
+                    self._extract( pak, entry )
+
+    def close(self):
+        for pak in self.paks.values():
+            pak.close()
+        self.paks.clear()
+        self.files.clear()
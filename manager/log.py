@@ -0,0 +1,205 @@
+import os
+import sys
+import time
+import threading
+import logging
+import queue
+import atexit
+import datetime
+
+def init_plog( log_folder_path, filename = None, format=None, datefmt = None, keep_logs=10 ):
+    from manager.pak import File
+
+    logger = logging.getLogger()
+    if not os.path.isdir( log_folder_path ):
+        os.makedirs(log_folder_path)
+
+    datefmt = datefmt or '%Y-%m-%d ~ %H-%M-%S-%p'
+        
+    log_folder = File( log_folder_path, [] )
+    log_file_path = filename or datetime.datetime.now().strftime( log_folder.filepath + '%Y-%m-%d ~ %H-%M-%S-%f' + '.log' )
+
+    while len( log_folder.contents ) >= keep_logs:
+        os.remove( log_folder.filepath + log_folder.contents.pop(0) )
+
+    format = format or '[%(asctime)-22s] : %(message)s'
+    
+    #Opened for appending once it is emptied, so lines merge workers append aren't written over.
+    log_file_path = os.sep.join( log_file_path.split(os.sep)[-2:] )
+    open( log_file_path, 'w' ).close()
+    file_handler = logging.FileHandler( log_file_path, mode = 'a' )
+    file_handler.setFormatter( logging.Formatter( format, datefmt ) )
+    file_handler.setLevel( logging.DEBUG )
+
+    #The log file is written by the plog listener thread, never by whoever called plog.
+    stop_plog()
+    _PLOG[ 'handlers' ] = [ file_handler ]
+    _PLOG[ 'file' ] = ( file_handler.baseFilename, format, datefmt )
+    logger.setLevel( logging.DEBUG )
+    _start_plog_listener()
+    logging.captureWarnings(True)
+
+def plog_file():
+    ''' Returns what attach_plog_file needs to log to this process's log file, or None if init_plog wasn't called. '''
+    return _PLOG[ 'file' ]
+
+def attach_plog_file( log_file ):
+    ''' Makes plog in a worker process append to the log file plog_file() returned in the process that started it.
+
+        Spawned workers start without the handler init_plog set up and forked ones mustn't share its stream.
+    '''
+    if log_file is None:
+        return
+    path, format, datefmt = log_file
+
+    file_handler = logging.FileHandler( path, mode = 'a' )
+    file_handler.setFormatter( logging.Formatter( format, datefmt ) )
+    file_handler.setLevel( logging.DEBUG )
+
+    stop_plog()
+    _PLOG[ 'handlers' ] = [ file_handler ]
+    _PLOG[ 'file' ] = log_file
+    logging.getLogger().setLevel( logging.DEBUG )
+
+#Debug Print
+def dprint( msg, *args, end='\n' ):
+    ''' Usage: 
+        >>>dprint( 'blah `3 be `3 dee `2 `1 sa `0.', 'ni', 'hi', 'bi', 'fly' ) 
+        >>>blah <class 'str'>(fly) be <class 'str'>(fly) dee <class 'str'>(bi) <class 'str'>(hi) sa <class 'str'>(ni).
+    '''
+    if args:
+        list = []
+        for arg in args:
+            list.append( arg )
+
+        msg = msg.split( '`' )
+
+        for i in range( len( msg ) ):
+            list_index = ''
+
+            char_list = [ char for char in msg[ i ] ]
+            
+            for j in range( len( char_list ) ):
+                char = char_list[ j ]
+                if char.isdigit():
+                    list_index += char_list.pop( j )
+                else:
+                    break
+                    
+            msg[ i ] = ''.join( char_list )
+
+            if list_index:
+                list_index = int( list_index )
+                msg[ i-1 ] = str( msg[ i-1 ] ) + str( type( list[ list_index ] ) ) + '( ' + str( list[ list_index ] ) + ' )'
+
+        msg = ''.join( msg )
+
+        plog( msg, end=end )
+    else:
+        plog( '%s(%s)', type(msg), msg )
+
+def plog( msg, *args, level=logging.INFO, end='\n', progress=False ):
+    ''' Logs msg % args to the console and the log file from a background thread.
+
+        Formatting is deferred to the listener thread and skipped entirely when level is disabled.
+        progress marks per-file chatter; the console shows at most a few of those per second.
+    '''
+    logger = logging.getLogger()
+    if _PLOG[ 'pid' ] != os.getpid():
+        #First call in this process (or in a freshly forked worker).
+        _start_plog_listener()
+    if not logger.isEnabledFor( level ):
+        return
+
+    if msg == '':
+        msg = ' '*100
+    logger.log( level, msg, *args, extra = { 'end': end, 'progress': progress } )
+
+_PLOG = { 'queue': None, 'queue_pid': None, 'handler': None, 'listener': None, 'pid': None, 'handlers': [], 'file': None }
+
+class _PlogQueueHandler( logging.Handler ):
+    ''' Passes records to the listener untouched so getMessage() runs on the listener thread. '''
+    def __init__(self, queue):
+        super( _PlogQueueHandler, self ).__init__()
+        self.queue = queue
+
+    def emit(self, record):
+        try:
+            self.queue.put_nowait( record )
+        except Exception:
+            self.handleError( record )
+
+class _PlogListener( object ):
+    ''' Hands queued records to handlers, respecting their levels, from one background thread.
+
+        Does what logging.handlers.QueueListener does without importing logging.handlers,
+        which pulls in socket and pickle and costs every headless build start up time.
+    '''
+    def __init__(self, queue, *handlers):
+        self.queue = queue
+        self.handlers = handlers
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread( target = self._run, daemon = True )
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            record = self.queue.get()
+            if record is None:
+                return
+            for handler in self.handlers:
+                if record.levelno >= handler.level:
+                    handler.handle( record )
+
+    def stop(self):
+        self.queue.put_nowait( None )
+        self._thread.join()
+        self._thread = None
+
+class _PlogConsoleHandler( logging.Handler ):
+    ''' Prints INFO and up padded out to overwrite the loading animation; progress records are rate-limited. '''
+    def __init__(self, progress_interval = 0.25):
+        super( _PlogConsoleHandler, self ).__init__( logging.INFO )
+        self.progress_interval = progress_interval
+        self._last_progress = 0.0
+
+    def emit(self, record):
+        if getattr( record, 'progress', False ):
+            now = time.monotonic()
+            if now - self._last_progress < self.progress_interval:
+                return
+            self._last_progress = now
+
+        try:
+            sys.stdout.write( '{0}{1}{2}'.format( record.getMessage(), ' '*100, getattr( record, 'end', '\n' ) ) )
+        except Exception:
+            self.handleError( record )
+
+def _start_plog_listener():
+    if _PLOG[ 'handler' ] is None:
+        _PLOG[ 'queue' ] = queue.SimpleQueue()
+        _PLOG[ 'handler' ] = _PlogQueueHandler( _PLOG[ 'queue' ] )
+
+        logger = logging.getLogger()
+        logger.addHandler( _PLOG[ 'handler' ] )
+        if logger.level == logging.NOTSET or logger.level > logging.INFO:
+            logger.setLevel( logging.INFO )
+        atexit.register( stop_plog )
+    elif _PLOG[ 'queue_pid' ] != os.getpid():
+        #Forked from the process that made the queue; the copy may be mid get() and holds the parent's records.
+        _PLOG[ 'queue' ] = _PLOG[ 'handler' ].queue = queue.SimpleQueue()
+    _PLOG[ 'queue_pid' ] = os.getpid()
+
+    _PLOG[ 'listener' ] = _PlogListener( _PLOG[ 'queue' ], _PlogConsoleHandler(), *_PLOG[ 'handlers' ] )
+    _PLOG[ 'listener' ].start()
+    _PLOG[ 'pid' ] = os.getpid()
+
+def stop_plog():
+    ''' Writes out everything still queued and stops the listener thread; the next plog starts a new one. '''
+    if _PLOG[ 'listener' ] is not None and _PLOG[ 'pid' ] == os.getpid():
+        _PLOG[ 'listener' ].stop()
+        sys.stdout.flush()
+    _PLOG[ 'listener' ] = None
+    _PLOG[ 'pid' ] = None
@@ -0,0 +1,381 @@
+import zipfile
+import os
+import json
+import collections
+import threading
+import logging
+import queue
+
+from manager.log import plog, stop_plog, attach_plog_file
+from manager.trace import TRACER
+from manager.pak import PakFile, File, RawFile, Pak
+from manager.index import VanillaCache
+
+class OmniManifest( object ):
+    ''' Records, for every member of the omni-mod, the hashes of the vanilla and mod files that produced it. '''
+    version = 2
+
+    def __init__(self, manifest_path, settings = None):
+        self.manifest_path = manifest_path
+        self.settings = settings or {}
+        self.members = {}
+
+    @classmethod
+    def load(cls, manifest_path, omni_mod_path, settings):
+        ''' Loads the manifest at manifest_path; it is empty if it was written by other settings or the omni-mod changed since. '''
+        manifest = cls( manifest_path, settings )
+
+        try:
+            with open( manifest_path, 'r' ) as manifest_file:
+                data = json.load( manifest_file )
+            stat = os.stat( omni_mod_path )
+        except ( OSError, ValueError ):
+            return manifest
+
+        if data.get( 'version' ) == cls.version and data.get( 'settings' ) == settings and \
+                data.get( 'omni_mod' ) == [ stat.st_size, stat.st_mtime_ns ]:
+            manifest.members = data.get( 'members', {} )
+
+        return manifest
+
+    def save(self, omni_mod_path):
+        stat = os.stat( omni_mod_path )
+
+        tmp_path = self.manifest_path + '.tmp'
+        with open( tmp_path, 'w' ) as manifest_file:
+            json.dump( {
+                'version': self.version,
+                'settings': self.settings,
+                'omni_mod': [ stat.st_size, stat.st_mtime_ns ],
+                'members': self.members
+            }, manifest_file )
+        os.replace( tmp_path, self.manifest_path )
+
+class MergeTarget( object ):
+    ''' One omni-mod file: the vanilla file it merges against and every mod member that goes into it, in load order. '''
+    def __init__(self, path, game_file_entry, mergeable, xml):
+        self.path = path
+        self.game_file_entry = game_file_entry
+        self.mergeable = mergeable
+        self.xml = xml
+        self.contributions = []
+
+    @property
+    def action(self):
+        ''' 'binary' and 'new' take the last mod's file, 'copy' takes the only mod's file and 'merge' merges them all. '''
+        if not self.mergeable:
+            return 'binary'
+        if not self.game_file_entry:
+            return 'new'
+        if len( self.contributions ) == 1:
+            return 'copy'
+        return 'merge'
+
+    @property
+    def conflicts(self):
+        ''' True if more than one mod touches this file. '''
+        return len( self.contributions ) > 1
+
+    @property
+    def merge_cost(self):
+        ''' Bytes of input the merge has to chew through; 0 unless the files actually get merged. '''
+        if self.action != 'merge':
+            return 0
+        return self.game_file_entry.file_size + sum( mod_file.info.file_size for _, mod_file in self.contributions )
+
+class MergePlan( object ):
+    ''' Every MergeTarget of an omni-mod build, keyed by lowercased path in the order they are written. '''
+    def __init__(self):
+        self.targets = {}
+        self.mod_paks = []
+
+    def report(self):
+        ''' Returns a human readable rundown of the plan for --dry-run. '''
+        lines = []
+        actions = collections.Counter()
+        for target in self.targets.values():
+            actions[ target.action ] += 1
+
+            lines.append( '{0:<7} {1}'.format( target.action, target.path ) )
+            if target.game_file_entry:
+                lines.append( '            vanilla: {0} ({1} bytes)'.format( os.path.basename( target.game_file_entry.pak_path ), target.game_file_entry.file_size ) )
+            for mod_pak_path, mod_file in target.contributions:
+                lines.append( '            mod:     {0} ({1} bytes)'.format( os.path.basename( mod_pak_path ), mod_file.info.file_size ) )
+            if target.action == 'merge':
+                lines.append( '            {0} merge of {1} bytes'.format( 'XML' if target.xml else 'line', target.merge_cost ) )
+
+        lines.append('')
+        lines.append( '{0} omni-mod files: {1}'.format( len( self.targets ), ', '.join( '{0} {1}'.format( count, action ) for action, count in sorted( actions.items() ) ) ) )
+        lines.append( '{0} files touched by more than one mod.'.format( sum( 1 for target in self.targets.values() if target.conflicts ) ) )
+        lines.append( '{0} bytes to merge.'.format( sum( target.merge_cost for target in self.targets.values() ) ) )
+
+        return '\n'.join( lines )
+
+    def close(self):
+        for mod_pak in self.mod_paks:
+            mod_pak.close()
+        self.mod_paks = []
+
+DIFF_REPORT_MODES = ( 'off', 'summary', 'full' )
+
+DiffReport = collections.namedtuple( 'DiffReport', [ 'mod', 'target', 'summary', 'report' ] )
+
+class DiffReportWriter( object ):
+    ''' Collects DiffReports into one compressed archive from a background thread.
+
+        The archive holds index.json, keyed by mod pak name and then target path, with each report's
+        summary and, for full reports, the name of the member holding the report text. Like PakWriter
+        it is written next to archive_path and only replaces it on close.
+    '''
+    def __init__(self, archive_path, full = True):
+        self.archive_path = archive_path
+        self.full = full
+        self.index = {}
+
+        self._previous = None
+        self._previous_index = {}
+        if os.path.isfile( self.archive_path ):
+            try:
+                self._previous = PakFile( self.archive_path )
+                self._previous_index = json.loads( self._previous.read( 'index.json' ) )
+            except ( zipfile.BadZipFile, KeyError, ValueError ):
+                plog( 'Ignoring unreadable diff report archive: %s', self.archive_path, level=logging.DEBUG )
+                if self._previous:
+                    self._previous.close()
+                self._previous = None
+                self._previous_index = {}
+
+        self.zip = zipfile.ZipFile( self.archive_path + '.tmp', 'w', zipfile.ZIP_DEFLATED )
+        self._queue = queue.SimpleQueue()
+        self._error = None
+        self._closed = False
+        self._thread = threading.Thread( target = self._run, daemon = True )
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def submit(self, diff_report):
+        self._queue.put( ( self._write, diff_report ) )
+
+    def carry_over(self, target):
+        ''' Keeps the previous archive's reports for target, which was reused rather than rebuilt. '''
+        self._queue.put( ( self._carry_over, target ) )
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if self._error is None:
+                try:
+                    item[0]( item[1] )
+                except Exception as error:
+                    self._error = error
+
+    def _add(self, mod, target, entry, report):
+        if report is not None and self.full:
+            member = '{0}/{1}.diff'.format( mod, target )
+            self.zip.writestr( member, report )
+            entry[ 'report' ] = member
+        self.index.setdefault( mod, {} )[ target ] = entry
+
+    def _write(self, diff_report):
+        report = diff_report.report.encode('utf-8') if diff_report.report is not None else None
+        self._add( diff_report.mod, diff_report.target, dict( diff_report.summary ), report )
+
+    def _carry_over(self, target):
+        for mod, targets in self._previous_index.items():
+            if target in targets:
+                entry = dict( targets[ target ] )
+                member = entry.pop( 'report', None )
+                self._add( mod, target, entry, self._previous.read( member ) if member else None )
+
+    def _stop(self):
+        if not self._closed:
+            self._closed = True
+            self._queue.put( None )
+            self._thread.join()
+            if self._previous:
+                self._previous.close()
+
+    def close(self):
+        self._stop()
+        if self._error is not None:
+            self.abort()
+            raise self._error
+
+        self.zip.writestr( 'index.json', json.dumps( self.index, indent = 1, sort_keys = True ) )
+        self.zip.close()
+        os.replace( self.archive_path + '.tmp', self.archive_path )
+
+    def abort(self):
+        self._stop()
+        self.zip.close()
+        if os.path.isfile( self.archive_path + '.tmp' ):
+            os.remove( self.archive_path + '.tmp' )
+
+class OmniModFileBuilder( object ):
+    ''' Folds every mod's version of one target file, in load order, into a single omni-mod File.
+
+        Only holds settings so it can be handed to merge worker processes. Unless diff_report_mode is 'off'
+        every merge leaves a DiffReport in diff_reports for whoever runs the builder to pass on.
+    '''
+    def __init__(self, diff_report_mode, log_folder_path, non_mergeable_types, accuracy, area_size, diff_engine, xml_merge_paths, max_merge_memory = None):
+        self.diff_report_mode = diff_report_mode
+        self.max_merge_memory = max_merge_memory
+        self.log_folder_path = log_folder_path
+        self.non_mergeable_types = non_mergeable_types
+        self.accuracy = accuracy
+        self.area_size = area_size
+        self.diff_engine = diff_engine
+        self.xml_merge_paths = xml_merge_paths
+
+        self.diff_reports = []
+
+    def merges_as_xml(self, filepath):
+        filepath = '/'.join( filepath.split( '\\' ) ).lower()
+        return filepath[-4:] == '.xml' and any( filepath.startswith( path ) for path in self.xml_merge_paths )
+
+    def build(self, contributions, game_file_entry, vanilla_cache):
+        ''' contributions is a load ordered list of ( mod pak path, File ); game_file_entry is the vanilla file to merge against. '''
+        with TRACER.span( 'build', file = contributions[0][1].filepath, mods = [ os.path.basename( mod_pak_path ) for mod_pak_path, _ in contributions ] ):
+            return self._build( contributions, game_file_entry, vanilla_cache )
+
+    def _build(self, contributions, game_file_entry, vanilla_cache):
+        mod_pak_path, mod_file = contributions[0]
+
+        if mod_file.ext in self.non_mergeable_types:
+            plog( '    Handling non-mergeable filetype: %s', mod_file.filepath, progress=True )
+            if len( contributions ) > 1:
+                plog( '        File already exists in Omni-Mod. Replacing file.', progress=True )
+            #Binary files are carried by reference and copied into the omni-mod as raw compressed bytes.
+            mod_pak_path, mod_file = contributions[-1]
+            return RawFile( mod_file.filepath.lower(), mod_pak_path, mod_file.info )
+
+        if not game_file_entry or len( contributions ) == 1:
+            #Nothing to merge; the last mod in the load order wins and its member is copied over as raw compressed bytes.
+            mod_pak_path, mod_file = contributions[-1]
+            plog( '            Creating New File in Omni-Mod: %s', mod_file.filepath, progress=True )
+            return RawFile( mod_file.filepath.lower(), mod_pak_path, mod_file.info )
+
+        plog( '        Reading Game File from: %s', game_file_entry.pak_path, progress=True )
+        original_game_file = vanilla_cache.get( game_file_entry )
+
+        plog( '            Creating New File in Omni-Mod: %s', mod_file.filepath, progress=True )
+        omni_mod_file = File( mod_file.filepath.lower(), mod_file.contents, mod_pak_path )
+
+        #The line merge machinery is only imported once a file actually needs merging.
+        from manager.diff import LineTable
+
+        #Every merge of this target shares one line table so each distinct line is interned once per chain.
+        line_table = LineTable()
+        for mod_pak_path, mod_file in contributions[1:]:
+            omni_mod_file = self.merge_files( original_game_file, omni_mod_file, mod_file, mod_pak_path, line_table )
+
+        return omni_mod_file
+
+    def merge_files(self, original_game_file, omni_mod_file, mod_file, mod_pak_name, line_table = None):
+        new_file = File( original_game_file.filepath, omni_mod_file.contents )
+
+        plog( '            Merging in Mod File: %s', mod_file.filepath, progress=True )
+
+        with TRACER.span( 'merge_file', file = mod_file.filepath, mod = os.path.basename( mod_pak_name ) ):
+            return self._merge_files( original_game_file, omni_mod_file, mod_file, mod_pak_name, new_file, line_table )
+
+    def _merge_files(self, original_game_file, omni_mod_file, mod_file, mod_pak_name, new_file, line_table):
+        from manager.diff import DiffCombiner
+
+        combiner = None
+        if self.merges_as_xml( original_game_file.filepath ):
+            from manager.xml_combiner import XmlCombiner, AmbiguousXmlError, etree
+            try:
+                combiner = XmlCombiner( original_game_file, mod_file, omni_mod_file, mod_pak_name )
+                new_file.contents = combiner.combine()
+            except ( etree.ParseError, AmbiguousXmlError ) as error:
+                plog( '            Could not merge as XML (%s); merging line by line instead.', error )
+                combiner = None
+
+        if combiner is None:
+            combiner = DiffCombiner( self.diff_report_mode, 
+                                     original_game_file, 
+                                     mod_file, 
+                                     omni_mod_file, 
+                                     mod_pak_name,
+                                     self.log_folder_path,
+                                     self.accuracy,
+                                     self.area_size,
+                                     self.diff_engine,
+                                     self.max_merge_memory,
+                                     line_table )
+            new_file.contents = combiner.combine()
+
+        if self.diff_report_mode in ( 'summary', 'full' ) and combiner.diff_summary:
+            self.diff_reports.append( DiffReport( os.path.basename( mod_pak_name ),
+                                                  omni_mod_file.filepath.lower(),
+                                                  combiner.diff_summary,
+                                                  combiner.diff_report if self.diff_report_mode == 'full' else None ) )
+
+        return new_file
+
+_MERGE_WORKER = {}
+
+#Most mod paks a merge worker keeps open between targets; the least recently used ones are closed.
+_MERGE_WORKER_OPEN_PAKS = 4
+
+def _init_merge_worker( builder, trace = False, log_file = None ):
+    ''' log_file is plog_file() of the building process; the worker appends its records to the same log. '''
+    #Only worker processes need it and it is slow to import.
+    import multiprocessing.util
+
+    attach_plog_file( log_file )
+    if trace:
+        TRACER.enable()
+        #Forked workers start with a copy of everything the main process recorded.
+        TRACER.drain()
+    #Worker processes never run atexit handlers; flush their log records on the way out instead.
+    multiprocessing.util.Finalize( None, stop_plog, exitpriority = 10 )
+    multiprocessing.util.Finalize( None, _close_merge_worker_paks, args = ( 0, ), exitpriority = 10 )
+    _MERGE_WORKER[ 'builder' ] = builder
+    _MERGE_WORKER[ 'paks' ] = collections.OrderedDict()
+
+def _close_merge_worker_paks( keep ):
+    ''' Closes all but the keep most recently used mod paks of this merge worker. '''
+    paks = _MERGE_WORKER.get( 'paks', {} )
+    while len( paks ) > keep:
+        paks.popitem( last = False )[1].close()
+
+def _merge_worker_build( contributions, game_file_entry, vanilla_contents = None ):
+    ''' Runs OmniModFileBuilder.build in a merge worker process; contributions is a list of ( mod pak path, member path ).
+        vanilla_contents, when given, is the already extracted contents of game_file_entry.
+    '''
+    builder = _MERGE_WORKER[ 'builder' ]
+    paks = _MERGE_WORKER[ 'paks' ]
+
+    #Every target has its own vanilla file, so nothing in the cache outlives the call.
+    vanilla_cache = VanillaCache()
+    if vanilla_contents is not None:
+        vanilla_cache.put( game_file_entry, vanilla_contents )
+
+    try:
+        mod_files = []
+        for mod_pak_path, filepath in contributions:
+            mod_pak = paks.pop( mod_pak_path, None )
+            if mod_pak is None:
+                mod_pak = Pak( mod_pak_path, lazy = True, raw_types = builder.non_mergeable_types )
+            paks[ mod_pak_path ] = mod_pak
+            mod_files.append( ( mod_pak_path, mod_pak.get_file( filepath ) ) )
+
+        builder.diff_reports = []
+        omni_mod_file = builder.build( mod_files, game_file_entry, vanilla_cache )
+    finally:
+        vanilla_cache.close()
+        _close_merge_worker_paks( _MERGE_WORKER_OPEN_PAKS )
+
+    return omni_mod_file.filepath, omni_mod_file.contents, omni_mod_file.zip_path, builder.diff_reports, TRACER.drain()
@@ -0,0 +1,539 @@
+import zipfile
+import os
+import sys
+import time
+import struct
+import collections
+import mmap
+import zlib
+import threading
+
+from manager.trace import TRACER
+
+class PakFile( object ):
+    ''' Read-only pak reader that memory-maps the pak and parses its central directory once.
+
+        Backslashes in member names are normalized to forward slashes when the directory is read.
+        STORED members are handed out as memoryview slices of the map and DEFLATED members are fed
+        straight from the map to zlib. Nothing is shared between reads so several threads can read at once.
+
+        With mapped False the pak is read with plain file reads instead. Those release the GIL while they
+        wait on the disk, where a page fault in the map holds it, so threads scanning many cold paks overlap.
+    '''
+    _end_of_central_directory = struct.Struct( '<4s4H2LH' )
+    _zip64_locator = struct.Struct( '<4sLQL' )
+    _zip64_end_of_central_directory = struct.Struct( '<4sQ2H2L4Q' )
+    _central_directory_entry = struct.Struct( '<4s4B4HL2L5H2L' )
+    _local_file_header = struct.Struct( '<4s2B4HL2L2H' )
+
+    def __init__(self, zip_path, mapped = True):
+        self.filename = zip_path
+        self.filelist = []
+        self.NameToInfo = {}
+
+        self._mmap = None
+        self._file = open( zip_path, 'rb' )
+        try:
+            self._size = os.fstat( self._file.fileno() ).st_size
+            if self._size < self._end_of_central_directory.size:
+                raise zipfile.BadZipFile( 'File is not a zip file: {0}'.format( zip_path ) )
+            if mapped:
+                self._mmap = mmap.mmap( self._file.fileno(), 0, access = mmap.ACCESS_READ )
+                self._view = memoryview( self._mmap )
+            else:
+                #Reads seek the one file object.
+                self._lock = threading.Lock()
+            self._read_central_directory()
+        except:
+            self._file.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    def _read(self, offset, length):
+        ''' Returns up to length bytes of the pak from offset. '''
+        if self._mmap is not None:
+            return self._mmap[ offset:offset+length ]
+        with self._lock:
+            self._file.seek( offset )
+            return self._file.read( length )
+
+    def _read_zip64_record(self, offset):
+        if not 0 <= offset <= self._size - self._zip64_end_of_central_directory.size:
+            return None
+        record = self._read( offset, self._zip64_end_of_central_directory.size )
+        return self._zip64_end_of_central_directory.unpack( record ) if record[ :4 ] == b'PK\x06\x06' else None
+
+    def _read_central_directory(self):
+        #The end record sits in the last 64k of the pak, with the zip64 locator right before it.
+        tail_offset = max( 0, self._size - self._end_of_central_directory.size - 0xFFFF - self._zip64_locator.size )
+        tail = self._read( tail_offset, self._size - tail_offset )
+        end = tail.rfind( b'PK\x05\x06', max( 0, self._size - self._end_of_central_directory.size - 0xFFFF ) - tail_offset )
+        if end < 0:
+            raise zipfile.BadZipFile( 'File is not a zip file: {0}'.format( self.filename ) )
+
+        _, _, _, _, count, directory_size, directory_offset, _ = self._end_of_central_directory.unpack_from( tail, end )
+        directory_end = end + tail_offset
+
+        locator = end - self._zip64_locator.size
+        if locator >= 0 and tail[ locator:locator+4 ] == b'PK\x06\x07':
+            #The locator says where the zip64 record is; if something was prepended to the archive it isn't there
+            #  and the record is taken to sit right before the locator instead.
+            zip64_end = self._zip64_locator.unpack_from( tail, locator )[ 2 ]
+            zip64_record = self._read_zip64_record( zip64_end )
+            if zip64_record is None:
+                zip64_end = locator + tail_offset - self._zip64_end_of_central_directory.size
+                zip64_record = self._read_zip64_record( zip64_end )
+            if zip64_record is not None:
+                count, directory_size, directory_offset = zip64_record[ 7 ], zip64_record[ 8 ], zip64_record[ 9 ]
+                directory_end = zip64_end
+
+        #Anything prepended to the archive shifts every offset by the same amount.
+        concat = directory_end - directory_size - directory_offset
+        if concat < 0 or directory_offset + concat < 0:
+            raise zipfile.BadZipFile( 'Bad offset for central directory' )
+
+        #The whole directory is read in one go and parsed from memory.
+        data = self._read( directory_offset + concat, directory_size )
+        position = 0
+        for _ in range( count ):
+            entry = self._central_directory_entry.unpack_from( data, position )
+            if entry[ 0 ] != b'PK\x01\x02':
+                raise zipfile.BadZipFile( 'Bad magic number for central directory' )
+
+            position += self._central_directory_entry.size
+            filename = data[ position:position+entry[ 12 ] ]
+            position += entry[ 12 ]
+            extra = data[ position:position+entry[ 13 ] ]
+            position += entry[ 13 ]
+            comment = data[ position:position+entry[ 14 ] ]
+            position += entry[ 14 ]
+
+            flag_bits = entry[ 5 ]
+            orig_filename = filename.decode( 'utf-8' if flag_bits & 0x800 else 'cp437' )
+            dos_time, dos_date = entry[ 7 ], entry[ 8 ]
+
+            info = zipfile.ZipInfo( '/'.join( orig_filename.split( '\\' ) ),
+                                    ( ( dos_date >> 9 ) + 1980, ( dos_date >> 5 ) & 0xF, dos_date & 0x1F, dos_time >> 11, ( dos_time >> 5 ) & 0x3F, ( dos_time & 0x1F ) * 2 ) )
+            info.orig_filename = orig_filename
+            info.create_version, info.create_system, info.extract_version, info.reserved = entry[ 1:5 ]
+            info.flag_bits = flag_bits
+            info.compress_type = entry[ 6 ]
+            info.CRC, info.compress_size, info.file_size = entry[ 9:12 ]
+            info.volume, info.internal_attr, info.external_attr = entry[ 15:18 ]
+            info.header_offset = entry[ 18 ]
+            info.extra = extra
+            info.comment = comment
+
+            if 0xFFFFFFFF in ( info.compress_size, info.file_size, info.header_offset ):
+                self._read_zip64_extra( info )
+            info.header_offset += concat
+
+            self.filelist.append( info )
+            self.NameToInfo[ info.filename ] = info
+
+    @staticmethod
+    def _read_zip64_extra(info):
+        extra = info.extra
+        while len( extra ) >= 4:
+            tag, length = struct.unpack( '<2H', extra[ :4 ] )
+            if tag == 0x0001:
+                values = iter( struct.unpack( '<{0}Q'.format( length // 8 ), extra[ 4:4+length ] ) )
+                if info.file_size == 0xFFFFFFFF:
+                    info.file_size = next( values )
+                if info.compress_size == 0xFFFFFFFF:
+                    info.compress_size = next( values )
+                if info.header_offset == 0xFFFFFFFF:
+                    info.header_offset = next( values )
+                return
+            extra = extra[ 4+length: ]
+
+    def infolist(self):
+        return self.filelist
+
+    def namelist(self):
+        return [ info.filename for info in self.filelist ]
+
+    def getinfo(self, name):
+        if isinstance( name, zipfile.ZipInfo ):
+            return name
+        try:
+            return self.NameToInfo[ '/'.join( name.split( '\\' ) ) ]
+        except KeyError:
+            raise KeyError( 'There is no item named {0!r} in the archive'.format( name ) )
+
+    def read_raw(self, info):
+        ''' Returns a memoryview of the still compressed bytes of the member described by info. '''
+        info = self.getinfo( info )
+        if info.flag_bits & 0x1:
+            raise NotImplementedError( 'encrypted members are not supported: {0}'.format( info.filename ) )
+
+        header = self._read( info.header_offset, self._local_file_header.size )
+        if header[ :4 ] != zipfile.stringFileHeader:
+            raise zipfile.BadZipFile( 'Bad magic number for file header' )
+        header = self._local_file_header.unpack( header )
+
+        start = info.header_offset + self._local_file_header.size + header[ 10 ] + header[ 11 ]
+        if start + info.compress_size > self._size:
+            raise zipfile.BadZipFile( 'Truncated member data' )
+        TRACER.count( 'bytes_read', info.compress_size )
+        if self._mmap is None:
+            return memoryview( self._read( start, info.compress_size ) )
+        return self._view[ start:start+info.compress_size ]
+
+    def iter_raw(self, info, chunk_size = 1 << 20):
+        ''' Yields the still compressed bytes of the member described by info as memoryview chunks. '''
+        raw = self.read_raw( info )
+        for start in range( 0, len( raw ), chunk_size ):
+            yield raw[ start:start+chunk_size ]
+
+    def view(self, name):
+        ''' Returns the uncompressed contents of a member; a zero-copy memoryview for STORED members. '''
+        info = self.getinfo( name )
+        raw = self.read_raw( info )
+
+        if info.compress_type == zipfile.ZIP_STORED:
+            contents = raw
+        elif info.compress_type == zipfile.ZIP_DEFLATED:
+            TRACER.count( 'members_decompressed' )
+            decompressor = zlib.decompressobj( -15 )
+            contents = decompressor.decompress( raw ) + decompressor.flush()
+        else:
+            raise NotImplementedError( 'compression type {0} is not supported: {1}'.format( info.compress_type, info.filename ) )
+
+        if zlib.crc32( contents ) != info.CRC:
+            raise zipfile.BadZipFile( 'Bad CRC-32 for file {0!r}'.format( info.filename ) )
+
+        return contents
+
+    def read(self, name):
+        return bytes( self.view( name ) )
+
+    def close(self):
+        if self.closed:
+            return
+        if self._mmap is not None:
+            self._view.release()
+            try:
+                self._mmap.close()
+            except BufferError:
+                #Someone still holds a memoryview of a member; the map goes away with the last of them.
+                pass
+        self._file.close()
+
+class FileContentsElement( object ):
+    def __init__( self, value ):
+        self.value = value
+
+    def __repr__( self ):
+        return str( self.value )
+            
+class FileContents( list ):
+    def __init__( self, items ):
+        for item in self.items:
+            self.append( item )
+            
+    def append(self, value):
+        list.append( self, FileContentsElement( value ) )
+            
+    def __setitem__(self, index, value):
+        list.__setitem__( self, index, FileContentsElement( value ) )
+            
+class File( object ):
+    def __init__(self, filepath, contents, zip_path = None, info = None):
+        self.filepath = filepath
+        self.ext = self.filepath.split( '.' )[-1]
+        
+        if os.path.isdir(self.filepath):
+            if self.filepath[-1] != os.sep:
+                self.filepath += os.sep
+            self.contents = sorted( os.listdir( self.filepath ) )
+        else:
+            self.contents = contents
+
+        self.zip_path = zip_path
+        self.info = info
+
+    @property
+    def contents(self):
+        return self._contents
+        
+    @contents.setter
+    def contents(self, value):
+        self._contents = value
+        
+    def __repr__(self):
+        return 'FileObject: {0}'.format( self.filepath )
+
+class LazyFile( File ):
+    ''' A File whose contents are only read out of its Pak when first accessed. '''
+    def __init__(self, filepath, pak, info = None):
+        self.pak = pak
+        super( LazyFile, self ).__init__( filepath, None, pak.zip_path, info )
+
+    @property
+    def contents(self):
+        if self._contents is None:
+            return self.pak.read( self.filepath )
+        return self._contents
+
+    @contents.setter
+    def contents(self, value):
+        self._contents = value
+
+class RawFile( File ):
+    ''' A File carried by reference to its member in a source pak.
+        Paks write it by copying the member's compressed bytes without decompressing them.
+    '''
+    def __init__(self, filepath, zip_path, info):
+        super( RawFile, self ).__init__( filepath, None, zip_path, info )
+
+    @property
+    def contents(self):
+        if self._contents is None:
+            with PakFile( self.zip_path ) as pak:
+                return pak.read( self.info ).decode('latin-1')
+        return self._contents
+
+    @contents.setter
+    def contents(self, value):
+        self._contents = value
+
+class Pak( object ):
+    def __init__(self, zip_path, lazy = False, cache_size = 32, raw_types = ()):
+        ''' When lazy is True only the central directory is read up front; members are decompressed
+            when their contents are first accessed and the last cache_size of them are kept around.
+            Members whose extension is in raw_types are never decoded; they become RawFiles.
+        '''
+        self.zip_path = zip_path
+        self.lazy = lazy
+        self.raw_types = raw_types
+        self.cache_size = cache_size
+        self._cache = collections.OrderedDict()
+        
+        if not os.path.isfile( self.zip_path ):
+            ezip = b'PK\x05\x06\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00'
+            with open(self.zip_path, 'wb') as zip:
+                zip.write(ezip)
+
+        self.zip = PakFile( self.zip_path )
+
+        self.files = []
+        self._files_by_name = {}
+
+        for member in self.zip.infolist():
+            if '.' in member.filename:
+                if member.filename.split( '.' )[-1] in self.raw_types:
+                    file = RawFile( member.filename, self.zip_path, member )
+                elif self.lazy:
+                    file = LazyFile( member.filename, self, member )
+                else:
+                    file = File( member.filename, self._read_member( member.filename ), self.zip_path, member )
+                self.files.append( file )
+                self._files_by_name.setdefault( member.filename.lower(), file )
+
+        if not self.lazy:
+            self.zip.close()
+
+    def _read_member(self, filename):
+        if self.zip.closed:
+            self.zip = PakFile( self.zip_path )
+
+        return str( self.zip.view( filename ), 'latin-1' )
+
+    def read(self, filename):
+        ''' Returns the decoded contents of filename, going through the pak's LRU cache. '''
+        try:
+            self._cache.move_to_end( filename )
+            return self._cache[ filename ]
+        except KeyError:
+            pass
+
+        file_contents = self._read_member( filename )
+
+        self._cache[ filename ] = file_contents
+        while len( self._cache ) > self.cache_size:
+            self._cache.popitem( last = False )
+
+        return file_contents
+
+    def get_file(self, filepath):
+        ''' Returns the File at filepath (case insensitive) or None. '''
+        return self._files_by_name.get( filepath.lower() )
+
+    def close(self):
+        self._cache.clear()
+        self.zip.close()
+
+    def __repr__(self):
+        str_list = []
+
+        str_list.append( '                             ')
+        str_list.append(self.zip_path)
+        str_list.append( '---' + self.zip_path )
+
+        for file in self.files:
+            str_list.append( '    ' + str(file) )
+
+        str_list.append('---')
+
+        return '\n'.join(str_list)
+
+    def write(self, filename = None):
+        if filename == None:
+            filename = self.zip_path
+
+        with TRACER.span( 'Pak.write', pak = filename, files = len( self.files ) ), PakWriter( filename ) as writer:
+            for file in self.files:
+                writer.write( file )
+            self.close()
+
+class PakWriter( object ):
+    ''' Streams members into a new pak as soon as they are finalized.
+
+        Everything is written to a temporary file next to zip_path which only replaces zip_path once
+        the writer is closed, so a crash mid-write never leaves a half written pak for the game to load.
+        RawFiles are copied as compressed bytes straight from their source pak. The local headers and
+        the central directory are written here rather than through zipfile.ZipFile, whose internals
+        raw copies would otherwise have to reach into.
+    '''
+    _zip64_limit = 0xFFFFFFFF
+    _zip64_count_limit = 0xFFFF
+    _create_system = 0 if sys.platform == 'win32' else 3
+
+    def __init__(self, zip_path, compression = zipfile.ZIP_STORED):
+        self.zip_path = zip_path
+        self.tmp_path = zip_path + '.tmp'
+        self.compression = compression
+
+        self._file = open( self.tmp_path, 'wb' )
+        self._entries = []
+        self._source_paks = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write(self, file):
+        if isinstance( file, RawFile ):
+            self.write_raw( file.filepath, file.zip_path, file.info )
+            return
+
+        file_contents = file.contents or ''
+        if not isinstance( file_contents, bytes ):
+            file_contents = file_contents.encode('latin-1')
+        TRACER.count( 'bytes_written', len( file_contents ) )
+
+        data = file_contents
+        if self.compression == zipfile.ZIP_DEFLATED:
+            compressor = zlib.compressobj( zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15 )
+            data = compressor.compress( file_contents ) + compressor.flush()
+
+        self._write_member( file.filepath, time.localtime()[ :6 ], self.compression, 0,
+                            zlib.crc32( file_contents ), len( data ), len( file_contents ), 0o600 << 16, ( data, ) )
+
+    def write_raw(self, filepath, zip_path, info):
+        ''' Copies the member described by info out of the pak at zip_path without decompressing it. '''
+        source_pak = self._source_paks.get( zip_path )
+        if source_pak is None:
+            source_pak = self._source_paks[ zip_path ] = PakFile( zip_path )
+
+        #Sizes go in the local header so a data descriptor is never needed; the name's encoding is worked out again.
+        flag_bits = info.flag_bits & ~( 0x08 | 0x800 )
+        self._write_member( filepath, info.date_time, info.compress_type, flag_bits,
+                            info.CRC, info.compress_size, info.file_size, info.external_attr, self._count_raw( source_pak.iter_raw( info ) ) )
+
+    @staticmethod
+    def _count_raw( chunks ):
+        for chunk in chunks:
+            TRACER.count( 'bytes_written', len( chunk ) )
+            yield chunk
+
+    def _write_member(self, filepath, date_time, compress_type, flag_bits, CRC, compress_size, file_size, external_attr, chunks):
+        try:
+            filename = filepath.encode( 'ascii' )
+        except UnicodeEncodeError:
+            filename = filepath.encode( 'utf-8' )
+            flag_bits |= 0x800
+
+        year, month, day, hour, minute, second = date_time
+        dos_date = ( max( year, 1980 ) - 1980 ) << 9 | month << 5 | day
+        dos_time = hour << 11 | minute << 5 | second // 2
+
+        header_offset = self._file.tell()
+        zip64 = compress_size > self._zip64_limit or file_size > self._zip64_limit
+        extra = struct.pack( '<2H2Q', 1, 16, file_size, compress_size ) if zip64 else b''
+
+        self._file.write( PakFile._local_file_header.pack( b'PK\x03\x04', 45 if zip64 else 20, 0, flag_bits, compress_type, dos_time, dos_date, CRC,
+                                                           0xFFFFFFFF if zip64 else compress_size, 0xFFFFFFFF if zip64 else file_size,
+                                                           len( filename ), len( extra ) ) )
+        self._file.write( filename )
+        self._file.write( extra )
+        for chunk in chunks:
+            self._file.write( chunk )
+
+        self._entries.append( ( filename, flag_bits, compress_type, dos_time, dos_date, CRC, compress_size, file_size, external_attr, header_offset ) )
+
+    def _fit(self, value, sentinel, limit = None):
+        ''' Returns value, or sentinel when value only fits in the zip64 records. '''
+        return sentinel if value > ( self._zip64_limit if limit is None else limit ) else value
+
+    def _write_central_directory(self):
+        directory_offset = self._file.tell()
+        for filename, flag_bits, compress_type, dos_time, dos_date, CRC, compress_size, file_size, external_attr, header_offset in self._entries:
+            #The zip64 extra field holds, in this order, whichever of these don't fit in 32 bits.
+            zip64_values = [ value for value in ( file_size, compress_size, header_offset ) if value > self._zip64_limit ]
+            extra = struct.pack( '<2H{0}Q'.format( len( zip64_values ) ), 1, 8 * len( zip64_values ), *zip64_values ) if zip64_values else b''
+            version = 45 if zip64_values else 20
+
+            self._file.write( PakFile._central_directory_entry.pack( b'PK\x01\x02', version, self._create_system, version, 0, flag_bits, compress_type, dos_time, dos_date, CRC,
+                                                                     self._fit( compress_size, 0xFFFFFFFF ), self._fit( file_size, 0xFFFFFFFF ),
+                                                                     len( filename ), len( extra ), 0, 0, 0, external_attr, self._fit( header_offset, 0xFFFFFFFF ) ) )
+            self._file.write( filename )
+            self._file.write( extra )
+
+        directory_size = self._file.tell() - directory_offset
+        count = len( self._entries )
+        if count > self._zip64_count_limit or directory_offset > self._zip64_limit or directory_size > self._zip64_limit:
+            zip64_end = self._file.tell()
+            self._file.write( PakFile._zip64_end_of_central_directory.pack( b'PK\x06\x06', 44, 45, 45, 0, 0, count, count, directory_size, directory_offset ) )
+            self._file.write( PakFile._zip64_locator.pack( b'PK\x06\x07', 0, zip64_end, 1 ) )
+
+        count = self._fit( count, 0xFFFF, self._zip64_count_limit )
+        self._file.write( PakFile._end_of_central_directory.pack( b'PK\x05\x06', 0, 0, count, count,
+                                                                  self._fit( directory_size, 0xFFFFFFFF ), self._fit( directory_offset, 0xFFFFFFFF ), 0 ) )
+
+    def _close_source_paks(self):
+        for source_pak in self._source_paks.values():
+            source_pak.close()
+        self._source_paks = {}
+
+    def close(self):
+        try:
+            self._write_central_directory()
+        finally:
+            self._file.close()
+            self._close_source_paks()
+        os.replace( self.tmp_path, self.zip_path )
+
+    def abort(self):
+        ''' Throws away everything written so far and leaves zip_path untouched. '''
+        self._file.close()
+        self._close_source_paks()
+        try:
+            os.remove( self.tmp_path )
+        except OSError:
+            pass
@@ -0,0 +1,92 @@
+import os
+import json
+import collections
+import time
+import threading
+
+class _TraceSpan( object ):
+    __slots__ = ( 'tracer', 'name', 'args', 'start' )
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = self.tracer.now()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.tracer.add_span( self.name, self.start, self.tracer.now() - self.start, self.args )
+
+class _NullSpan( object ):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+class Tracer( object ):
+    ''' Records spans and counters and exports them as Chrome trace_event JSON (chrome://tracing, Perfetto).
+
+        Disabled tracers hand out a shared no-op span so instrumented code costs next to nothing.
+        Timestamps are wall clock microseconds so events recorded in merge worker processes line up
+        with the main process once they are handed back with add_events.
+    '''
+    _null_span = _NullSpan()
+
+    def __init__(self):
+        self.enabled = False
+        self.events = []
+        self.counters = collections.Counter()
+        self._lock = threading.Lock()
+        self._offset = time.time_ns() - time.perf_counter_ns()
+
+    def enable(self):
+        self.enabled = True
+
+    def now(self):
+        return ( time.perf_counter_ns() + self._offset ) // 1000
+
+    def span(self, name, **args):
+        if not self.enabled:
+            return self._null_span
+        return _TraceSpan( self, name, args )
+
+    def add_span(self, name, start, duration, args = None):
+        event = { 'name': name, 'ph': 'X', 'ts': start, 'dur': duration, 'pid': os.getpid(), 'tid': threading.get_ident() }
+        if args:
+            event[ 'args' ] = args
+
+        with self._lock:
+            self.events.append( event )
+            #Counters are sampled whenever a span closes instead of on every increment.
+            if self.counters:
+                self.events.append( { 'name': 'counters', 'ph': 'C', 'ts': start + duration, 'pid': os.getpid(), 'args': dict( self.counters ) } )
+
+    def count(self, name, value = 1):
+        if self.enabled:
+            #The diff report writer thread counts too.
+            with self._lock:
+                self.counters[ name ] += value
+
+    def drain(self):
+        ''' Returns and forgets the events and counters recorded so far; used to ship worker events to the main process. '''
+        with self._lock:
+            events, self.events = self.events, []
+            counters, self.counters = self.counters, collections.Counter()
+        return events, counters
+
+    def add_events(self, events, counters = None):
+        with self._lock:
+            self.events.extend( events )
+            self.counters.update( counters or {} )
+
+    def save(self, trace_path):
+        with self._lock:
+            trace = { 'traceEvents': self.events, 'displayTimeUnit': 'ms', 'otherData': { 'counters': dict( self.counters ) } }
+        with open( trace_path, 'w' ) as trace_file:
+            json.dump( trace, trace_file )
+
+#Module wide tracer; enabled by --trace.
+TRACER = Tracer()
@@ -0,0 +1,242 @@
+import os
+import collections
+import xml.etree.ElementTree as etree
+import io
+import re
+import copy
+
+from manager.trace import TRACER
+
+def reindentXmlString( xmlToFix ):
+    xml = etree.fromstringlist( xmlToFix )
+    return etree.tostring(xml, encoding='utf-8', method='xml').decode()
+    
+class AmbiguousXmlError( ValueError ):
+    ''' Raised when a parent's children can't be told apart by their keys; the file has to be merged line by line. '''
+
+class XmlCombiner( object ):
+    ''' Merges an XML mod file into the omni-mod file element by element instead of line by line.
+
+        Children are keyed by their tag and id-like attributes; whatever the mod adds, removes or changes
+        relative to the original game file is applied to the matching elements of the omni-mod file.
+        If the mod changes children that share a key, combine raises AmbiguousXmlError rather than
+        guessing which is which by position.
+
+        Namespace prefixes and declarations are kept as written, as are comments and processing
+        instructions, including the ones before and after the root element, and a UTF-8 byte order mark.
+    '''
+    key_attributes = ( 'id', 'name' )
+
+    #Prefix the parser can't see being declared.
+    implicit_namespaces = { 'http://www.w3.org/XML/1998/namespace': 'xml' }
+
+    #UTF-8 byte order mark as it reads once the file is latin-1 decoded.
+    utf8_bom = '\xef\xbb\xbf'
+
+    def __init__( self, original_game_file, mod_file, omni_mod_file, mod_pak_name ):
+        self.mod_pak_name = mod_pak_name.split(os.sep)[-1]
+        self.mod_file = mod_file
+
+        self.original_file = original_game_file.contents
+        self.omni_mod_file = omni_mod_file.contents
+
+        self.diff_report = None
+        self.diff_summary = None
+        self._changes = []
+
+    @classmethod
+    def parse( cls, contents ):
+        ''' Parses contents ( latin-1 decoded bytes ) and returns the root element, keeping comments.
+
+            Names are kept as prefix:name and namespace declarations as xmlns attributes instead of
+            being resolved, so serializing writes them back exactly as they were.
+        '''
+        parser = etree.XMLParser( target = etree.TreeBuilder( insert_comments = True, insert_pis = True ) )
+        prefixes = dict( cls.implicit_namespaces )
+        declared = []
+        root = None
+        for event, item in etree.iterparse( io.BytesIO( contents.encode('latin-1') ), events = ( 'start-ns', 'start' ), parser = parser ):
+            if event == 'start-ns':
+                prefix, uri = item
+                prefixes.setdefault( uri, prefix )
+                declared.append( item )
+                continue
+
+            element = item
+            if root is None:
+                root = element
+
+            attributes = [ ( 'xmlns:' + prefix if prefix else 'xmlns', uri ) for prefix, uri in declared ]
+            attributes += [ ( cls._prefixed( name, prefixes ), value ) for name, value in element.attrib.items() ]
+            declared = []
+
+            element.tag = cls._prefixed( element.tag, prefixes )
+            element.attrib.clear()
+            element.attrib.update( attributes )
+        return root
+
+    @staticmethod
+    def _prefixed( name, prefixes ):
+        ''' Turns the parser's {uri}name back into prefix:name. '''
+        if name[ :1 ] != '{':
+            return name
+        uri, name = name[ 1: ].split( '}', 1 )
+        prefix = prefixes.get( uri )
+        return prefix + ':' + name if prefix else name
+
+    @classmethod
+    def _split_prolog( cls, contents ):
+        ''' Returns the text of contents before and after its root element: byte order mark, declarations, comments and whitespace. '''
+        bom = cls.utf8_bom if contents.startswith( cls.utf8_bom ) else ''
+        prolog = bom + re.match( r'(?:\s+|<\?.*?\?>|<!--.*?-->|<!DOCTYPE[^>]*>)*', contents[ len( bom ): ], re.S ).group( 0 )
+
+        end = len( contents )
+        while True:
+            stripped = contents[ :end ].rstrip()
+            if stripped.endswith( '-->' ):
+                end = stripped.rfind( '<!--' )
+            elif stripped.endswith( '?>' ):
+                end = stripped.rfind( '<?' )
+            else:
+                end = len( stripped )
+                break
+        return prolog, contents[ end: ]
+
+    @classmethod
+    def serialize( cls, root, contents ):
+        ''' Serializes root keeping the xml declaration, encoding, comments and whitespace around the root element of contents. '''
+        prolog, epilog = cls._split_prolog( contents )
+        encoding = re.search( r'<\?xml[^>]*encoding=[\'"]([^\'"]+)', prolog )
+        encoding = encoding.group( 1 ) if encoding else 'utf-8'
+
+        root.tail = None
+        body = etree.tostring( root, encoding = encoding, xml_declaration = False ).decode('latin-1')
+
+        return prolog + body + epilog
+
+    @classmethod
+    def element_key( cls, element ):
+        ids = tuple( ( name, value ) for name, value in sorted( element.attrib.items() )
+                     if name.lower() in cls.key_attributes or name.lower().endswith( '_id' ) )
+        return ( element.tag, ids )
+
+    def keyed_children( self, parent ):
+        ''' Returns { ( key, occurrence ): child } for every child element of parent, in document order. '''
+        children = {}
+        occurrences = collections.Counter()
+        for child in parent:
+            if not isinstance( child.tag, str ):
+                continue
+            key = self.element_key( child )
+            children[ ( key, occurrences[ key ] ) ] = child
+            occurrences[ key ] += 1
+        return children
+
+    def combine( self ):
+        with TRACER.span( 'XmlCombiner.combine', file = self.mod_file.filepath, mod = self.mod_pak_name ):
+            return self._combine()
+
+    def _combine( self ):
+        original = self.parse( self.original_file )
+        omni = self.parse( self.omni_mod_file or self.original_file )
+        mod = self.parse( self.mod_file.contents )
+
+        self._merge_element( original, omni, mod, omni.tag )
+
+        self.diff_report = '\n'.join( self._changes ) or None
+        if self._changes:
+            self.diff_summary = { 'changes': len( self._changes ) }
+        return self.serialize( omni, self.omni_mod_file or self.original_file )
+
+    def _merge_element( self, original, omni, mod, path ):
+        for name, value in mod.attrib.items():
+            if original.get( name ) != value and omni.get( name ) != value:
+                self._changes.append( '~ {0} @{1}={2}'.format( path, name, value ) )
+                omni.set( name, value )
+        for name in original.attrib:
+            if name not in mod.attrib and name in omni.attrib:
+                self._changes.append( '~ {0} -@{1}'.format( path, name ) )
+                del omni.attrib[ name ]
+
+        if ( mod.text or '' ).strip() != ( original.text or '' ).strip():
+            omni.text = mod.text
+
+        self._merge_children( original, omni, mod, path )
+
+    @classmethod
+    def same_tree( cls, element1, element2 ):
+        ''' True if two elements have the same tag, attributes, text and children, ignoring whitespace between elements. '''
+        return ( element1.tag == element2.tag and element1.attrib == element2.attrib
+                 and ( element1.text or '' ).strip() == ( element2.text or '' ).strip()
+                 and len( element1 ) == len( element2 )
+                 and all( cls.same_tree( child1, child2 ) for child1, child2 in zip( element1, element2 ) ) )
+
+    def _merge_children( self, original, omni, mod, path ):
+        original_children = self.keyed_children( original )
+        omni_children = self.keyed_children( omni )
+        mod_children = self.keyed_children( mod )
+
+        #Children sharing a key could only be paired up by position, which goes wrong as soon as
+        #  an earlier mod inserted or removed one of them.
+        if any( occurrence for children in ( original_children, omni_children, mod_children ) for _, occurrence in children ):
+            if len( original ) == len( mod ) and all( self.same_tree( child1, child2 ) for child1, child2 in zip( original, mod ) ):
+                return
+            raise AmbiguousXmlError( 'children of {0} can\'t be told apart by their keys'.format( path ) )
+
+        omni_keys = { id( child ): key for key, child in omni_children.items() }
+
+        removed = set()
+        for key in original_children:
+            if key not in mod_children and key in omni_children:
+                self._changes.append( '- {0}/{1}'.format( path, key[0][0] ) + ''.join( '[@{0}={1}]'.format( *id_ ) for id_ in key[0][1] ) )
+                removed.add( id( omni_children.pop( key ) ) )
+
+        #New elements go after the closest preceding mod sibling the omni-mod file also has.
+        added = collections.defaultdict( list )
+        anchor = None
+        for key, mod_child in mod_children.items():
+            child_path = '{0}/{1}'.format( path, key[0][0] ) + ''.join( '[@{0}={1}]'.format( *id_ ) for id_ in key[0][1] )
+            original_child = original_children.get( key )
+            omni_child = omni_children.get( key )
+
+            if omni_child is None:
+                if original_child is None:
+                    self._changes.append( '+ ' + child_path )
+                    added[ anchor ].append( copy.deepcopy( mod_child ) )
+                continue
+
+            if original_child is None:
+                #Added by an earlier mod as well; this mod's version wins.
+                self._merge_element( omni_child, omni_child, mod_child, child_path )
+            else:
+                self._merge_element( original_child, omni_child, mod_child, child_path )
+            anchor = key
+
+        if not removed and not added:
+            return
+
+        old_children = list( omni )
+        inserted = set( id( child ) for children in added.values() for child in children )
+
+        children = list( added.get( None, () ) )
+        for child in old_children:
+            if id( child ) in removed:
+                continue
+            children.append( child )
+            children.extend( added.get( omni_keys.get( id( child ) ), () ) )
+
+        if old_children:
+            closing_tail = old_children[ -1 ].tail
+            indent = old_children[ 0 ].tail if len( old_children ) > 1 else ( mod[ 0 ].tail if len( mod ) > 1 else closing_tail )
+        else:
+            omni.text = mod.text
+            closing_tail = mod[ -1 ].tail if len( mod ) else None
+            indent = mod[ 0 ].tail if len( mod ) > 1 else closing_tail
+
+        for child in children[ :-1 ]:
+            if id( child ) in inserted or ( old_children and child is old_children[ -1 ] ):
+                child.tail = indent
+        if children:
+            children[ -1 ].tail = closing_tail
+
+        omni[:] = children
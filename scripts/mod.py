@@ -1,41 +1,61 @@
 #Should be made up two labels, and two buttons.
-#Label 1 should be the position of the mod in mod_list and 
+#Label 1 should be the position of the mod in mod_list and
 #Label 2 should be the name of the mod.
 #button one should move the element up in the mod_list
 #button two should move the element down in the mod_list
 
+from kivy.properties import NumericProperty, StringProperty
 from kivy.uix.button import Button
 from kivy.uix.label import Label
 from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.recycleview.views import RecycleDataViewBehavior
 
-class Mod(BoxLayout):
-    def __init__(self, mod_name, position, *args, **kwargs):
+class Mod(RecycleDataViewBehavior, BoxLayout):
+    ''' One row of the ModList. The RecycleView reuses the few rows on screen for whichever records are
+        scrolled into view, setting position and mod_name from the record.
+    '''
+    position = NumericProperty(0)
+    mod_name = StringProperty('')
+
+    def __init__(self, mod_name='', position=0, *args, **kwargs):
         super(Mod, self).__init__(*args, **kwargs)
-        
-        self._position = position
+
+        #Index of the record shown and the ModList showing it; set by refresh_view_attrs.
+        self.index = None
+        self.mod_list = None
 
         self._position_label = Label()
-        self._position_label.text = self.position
         self.add_widget(self._position_label)
 
         self._mod_name_label = Label()
-        self._mod_name_label.text = mod_name
         self.add_widget(self._mod_name_label)
 
         self._up_button = Button()
         self._up_button.text = 'up'
+        self._up_button.bind(on_press=lambda button: self.move(-1))
         self.add_widget(self._up_button)
 
         self._dn_button = Button()
         self._dn_button.text = 'dn'
+        self._dn_button.bind(on_press=lambda button: self.move(1))
         self.add_widget(self._dn_button)
 
-    @property
-    def position(self):
-        return str(self._position)
-        
-    @position.setter
-    def position(self, value):
-        #TODO: make it change the position of this object in the parent object
-        self._position = value
-        self._position_label.text = self.position
\ No newline at end of file
+        self.mod_name = mod_name
+        self.position = position
+        self._position_label.text = str(self.position)
+        self._mod_name_label.text = self.mod_name
+
+    def refresh_view_attrs(self, rv, index, data):
+        self.index = index
+        self.mod_list = rv
+        return super(Mod, self).refresh_view_attrs(rv, index, data)
+
+    def on_position(self, instance, value):
+        self._position_label.text = str(value)
+
+    def on_mod_name(self, instance, value):
+        self._mod_name_label.text = value
+
+    def move(self, offset):
+        if self.mod_list is not None and self.index is not None:
+            self.mod_list.move_mod(self.index, offset)
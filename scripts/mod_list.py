@@ -1,24 +1,39 @@
-from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.recycleview import RecycleView
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
 
 from scripts.mod import Mod
-from manager import get_paths
 
-class ModList(BoxLayout):
-    def __init__(self, manager, *args, **kwargs):
+class ModList(RecycleView):
+    ''' Shows the mods in load order; ModListContainer adds them in batches as its loader thread finds them.
+
+        data holds one {'position', 'mod_name'} record per mod and only the rows on screen are Mod widgets,
+        so the number of widgets, and the cost of a resize, doesn't grow with the number of mods.
+    '''
+    row_height = 40
+
+    def __init__(self, *args, **kwargs):
         super(ModList, self).__init__(*args, **kwargs)
-        
-        #TODO: Move manager to parent 'ModListContainer' object 
-        self.manager = manager
-        self.manager.populate_mod_paks()
-        self.manager.sort_mods_by_load_order()
-        #self.populate_original_game_paks()
-        #self.manager.make_omnipak()
-        
-        for i in range( len( manager.mod_paks ) ):
-            m = Mod( manager.mod_paks[i].zip_path, i )
-            self.add_widget(m)
-
-'''
-for mod in os.listdir('mods'):
-            print(mod)
-'''
\ No newline at end of file
+
+        self.viewclass = Mod
+
+        layout = RecycleBoxLayout(orientation='vertical', size_hint_y=None,
+                                  default_size=(None, self.row_height), default_size_hint=(1, None))
+        layout.bind(minimum_height=layout.setter('height'))
+        self.add_widget(layout)
+
+    @property
+    def mod_names(self):
+        return [record['mod_name'] for record in self.data]
+
+    def add_mods(self, mod_names):
+        position = len(self.data)
+        self.data.extend([{'position': position + i, 'mod_name': mod_name} for i, mod_name in enumerate(mod_names)])
+
+    def move_mod(self, index, offset):
+        ''' Swaps the mod at index with the one offset places away; only the two records change. '''
+        other = index + offset
+        if not 0 <= index < len(self.data) or not 0 <= other < len(self.data):
+            return
+
+        self.data[index], self.data[other] = {'position': index, 'mod_name': self.data[other]['mod_name']},\
+                                             {'position': other, 'mod_name': self.data[index]['mod_name']}
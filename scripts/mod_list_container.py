@@ -1,20 +1,89 @@
+import os
+import threading
+import collections
+from functools import partial
+
+from kivy.clock import Clock
 from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.label import Label
+from kivy.uix.progressbar import ProgressBar
 
 from scripts.mod_list import ModList
-from manager import get_paths, Manager
 
 class ModListContainer(BoxLayout):
+    #Most mods handed to the mod list in one frame.
+    batch_size = 50
+
     def __init__(self, *args, **kwargs):
+        kwargs.setdefault('orientation', 'vertical')
         super(ModListContainer, self).__init__(*args, **kwargs)
-        
-        usercfg, data_path, localization_path, mods_path = get_paths()
-        
-        self.manager = Manager(mods_path, data_path)
-        
-        self.mod_list = ModList(self.manager)
+
+        #Only set once the loader thread is done with it.
+        self.manager = None
+
+        self._status_label = Label(text='Looking for mods...', size_hint_y=None, height=30)
+        self.add_widget(self._status_label)
+
+        self._progress_bar = ProgressBar(max=1, value=0, size_hint_y=None, height=20)
+        self.add_widget(self._progress_bar)
+
+        self.mod_list = ModList()
         self.add_widget(self.mod_list)
-        
+
+        #Mod names the loader thread found that haven't been handed to the mod list yet.
+        self._pending_mod_names = collections.deque()
+
+        #Finding and scanning the mod paks happens on a worker thread so the first frame never waits on it;
+        #   it only ever talks to the widgets through Clock.schedule_once.
+        self._loader_thread = threading.Thread(target=self._load_mods, daemon=True)
+        self._loader_thread.start()
+
         #TODO: Move these two lines out to buttons.
         #self.manager.populate_original_game_paks()
         #self.manager.make_omnipak()
-        
\ No newline at end of file
+
+    def _load_mods(self):
+        ''' Runs on the loader thread. '''
+        #Importing the manager is part of the work the first frame shouldn't wait on.
+        from manager import get_paths, Manager
+
+        try:
+            usercfg, data_path, localization_path, mods_path, diff_report_folder_path, log_folder_path, load_order_path, cache_folder_path = get_paths()
+
+            manager = Manager(data_path, mods_path, diff_report_folder_path, log_folder_path, load_order_path, cache_folder_path)
+            manager.populate_mod_paks()
+
+            self._pending_mod_names.extend(os.path.basename(mod_pak_path) for mod_pak_path in manager.mod_pak_paths)
+            Clock.schedule_once(self._add_pending_mods)
+
+            manager.scan_mod_paks(progress=self._scan_progress)
+        except Exception as error:
+            Clock.schedule_once(partial(self._load_failed, error))
+            raise
+
+        Clock.schedule_once(partial(self._mods_loaded, manager))
+
+    def _scan_progress(self, done, total):
+        ''' Runs on the loader thread. '''
+        Clock.schedule_once(partial(self._show_progress, done, total))
+
+    def _add_pending_mods(self, dt):
+        ''' Hands the mod list one batch of mods per frame until none are left. '''
+        batch = [self._pending_mod_names.popleft() for _ in range(min(self.batch_size, len(self._pending_mod_names)))]
+        self.mod_list.add_mods(batch)
+
+        if self._pending_mod_names:
+            Clock.schedule_once(self._add_pending_mods)
+
+    def _show_progress(self, done, total, dt):
+        self._status_label.text = 'Scanning mods {0}/{1}'.format(done, total)
+        self._progress_bar.max = total or 1
+        self._progress_bar.value = done
+
+    def _mods_loaded(self, manager, dt):
+        self.manager = manager
+        self._status_label.text = '{0} mods'.format(len(manager.mod_pak_paths))
+        self._progress_bar.value = self._progress_bar.max
+
+    def _load_failed(self, error, dt):
+        self._status_label.text = 'Could not load mods: {0}'.format(error)